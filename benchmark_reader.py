@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Excel読み込みエンジンのベンチマーク
+オリジナルデータの読み込み時間をエンジンごとに計測する
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from purchase_report_generator import EXCEL_READER_ENGINES
+
+def benchmark_file(file_path, repeat=3):
+    """
+    1ファイルをエンジンごとに読み込んで時間を計測
+
+    Args:
+        file_path (pathlib.Path): 対象ファイルのパス
+        repeat (int): 計測回数（最短時間を採用）
+
+    Returns:
+        list: エンジンごとの計測結果（dict）
+    """
+    results = []
+    for engine in EXCEL_READER_ENGINES.get(file_path.suffix.lower(), EXCEL_READER_ENGINES['.xlsx']):
+        timings = []
+        rows = None
+        error = None
+        for _ in range(repeat):
+            try:
+                start = time.perf_counter()
+                data = pd.read_excel(file_path, engine=engine)
+                timings.append(time.perf_counter() - start)
+                rows = len(data)
+            except Exception as e:
+                error = str(e)
+                break
+        results.append({
+            'engine': engine,
+            'seconds': min(timings) if timings else None,
+            'rows': rows,
+            'error': error
+        })
+    return results
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="Excel読み込みエンジンごとの読み込み時間を計測します")
+    parser.add_argument('files', nargs='*', help="対象ファイル（省略時はSampleData内の*.xls, *.xlsx）")
+    parser.add_argument('--repeat', type=int, default=3, help="計測回数（デフォルト: 3）")
+    args = parser.parse_args()
+
+    files = [Path(f) for f in args.files] or sorted(Path("SampleData").glob("*.xls*"))
+    if not files:
+        print("対象ファイルが見つかりません")
+        return
+
+    for file_path in files:
+        print(f"\n--- {file_path.name} ---")
+        for result in benchmark_file(file_path, args.repeat):
+            if result['error']:
+                print(f"  {result['engine']:<10} 利用不可: {result['error']}")
+            else:
+                print(f"  {result['engine']:<10} {result['seconds'] * 1000:10.1f} ms  ({result['rows']}行)")
+
+if __name__ == "__main__":
+    main()
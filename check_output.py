@@ -2,72 +2,88 @@
 # -*- coding: utf-8 -*-
 """
 出力ファイル確認スクリプト
-ReportOutputディレクトリ内のファイルを確認する
+ReportOutputディレクトリ内のファイルを確認する（マニフェストを参照し、各ファイルは再読み込みしない）
 """
 
-import json
-import pandas as pd
+import argparse
 from pathlib import Path
 
-def check_output_files():
+from output_manifest import OutputManifest
+
+def check_output_files(output_dir="ReportOutput"):
     """出力ファイルを確認"""
-    output_dir = Path("ReportOutput")
-    
+    output_dir = Path(output_dir)
+
     if not output_dir.exists():
         print("ReportOutputディレクトリが見つかりません")
         return
-    
+
+    manifest = OutputManifest(output_dir)
+
+    # マニフェスト未登録のファイルがあれば一度だけ読み込んで登録
+    if not manifest.manifest_path.exists():
+        manifest.rebuild()
+
+    entries = manifest.entries()
+
     print("=== ReportOutputディレクトリの内容 ===")
-    
-    # ディレクトリ内のファイルを一覧表示
-    files = list(output_dir.glob("*"))
-    for file in files:
-        if file.is_file():
-            print(f"ファイル: {file.name} ({file.stat().st_size:,} bytes)")
-    
+
+    for entry in entries:
+        size = f"{entry['size']:,} bytes" if entry.get('size') is not None else "サイズ不明"
+        print(f"ファイル: {entry['path']} ({size})")
+
     print("\n=== 集計ファイルの内容確認 ===")
-    
-    # 集計JSONファイルを確認
-    summary_files = list(output_dir.glob("*summary*.json"))
-    for file in summary_files:
-        print(f"\n--- {file.name} ---")
-        with open(file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        print(f"生成日時: {data['metadata']['generated_at']}")
-        print(f"分類数: {data['metadata']['category_count']}")
-        print(f"ファイル数: {data['metadata']['file_count']}")
-        
+
+    for entry in manifest.entries('summary_json'):
+        details = entry['details']
+        print(f"\n--- {entry['path']} ---")
+        print(f"生成日時: {entry['created_at']}")
+        print(f"分類数: {details['category_count']}")
+        print(f"ファイル数: {details['file_count']}")
+
         print("\n分類別集計:")
-        for category in data['category_summary']:
+        for category in details['category_summary']:
             print(f"  {category['分類名称（置換後）']}: {category['件数']}件, {category['合計金額']:,}円")
-        
+
         print("\nファイル別集計:")
-        for file_summary in data['file_summary']:
+        for file_summary in details['file_summary']:
             print(f"  {file_summary['ファイルNO']}: {file_summary['件数']}件, {file_summary['合計金額']:,}円")
-    
+
     print("\n=== 詳細データファイルの内容確認 ===")
-    
-    # CSVファイルを確認
-    csv_files = list(output_dir.glob("*.csv"))
-    for file in csv_files:
-        print(f"\n--- {file.name} ---")
-        df = pd.read_csv(file, encoding='utf-8-sig')
-        print(f"行数: {len(df)}")
-        print(f"列数: {len(df.columns)}")
-        print(f"列名: {list(df.columns)}")
-        
+
+    for entry in manifest.entries('report_csv'):
+        details = entry['details']
+        print(f"\n--- {entry['path']} ---")
+        print(f"行数: {entry['row_count']}")
+        print(f"列数: {len(details.get('columns', []))}")
+        print(f"列名: {details.get('columns', [])}")
+
         # 分類別の件数を表示
-        if '分類名称_置換後' in df.columns:
+        if 'category_counts' in details:
             print("\n分類別件数:")
-            category_counts = df['分類名称_置換後'].value_counts()
-            for category, count in category_counts.items():
+            for category, count in details['category_counts'].items():
                 print(f"  {category}: {count}件")
-        
+
         # 合計金額を表示
-        if '受入金額' in df.columns:
-            total_amount = df['受入金額'].sum()
-            print(f"\n合計金額: {total_amount:,}円")
+        if '受入金額' in entry['totals']:
+            print(f"\n合計金額: {entry['totals']['受入金額']:,}円")
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="ReportOutputディレクトリの出力ファイルを確認します")
+    parser.add_argument('--rebuild', action='store_true', help="マニフェスト未登録の既存ファイルを登録する")
+    parser.add_argument('--retention', action='store_true', help="保持ポリシーを適用する（古いファイルの圧縮・削除）")
+    parser.add_argument('--compress-after-days', type=int, default=30, help="圧縮するまでの日数（デフォルト: 30）")
+    parser.add_argument('--delete-after-days', type=int, default=180, help="削除するまでの日数（デフォルト: 180）")
+    args = parser.parse_args()
+
+    manifest = OutputManifest("ReportOutput")
+    if args.rebuild:
+        manifest.rebuild()
+    if args.retention:
+        manifest.apply_retention(args.compress_after_days, args.delete_after_days)
 
-if __name__ == "__main__":
     check_output_files()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列名解決ユーティリティ
+出力列の検索キーワードから元データの列を決定し、見出し行の指紋（ハッシュ）ごとに結果を保存する
+同じレイアウトのエクスポートは保存済みの対応付けを再利用し、レイアウトが変わった場合は変換前にエラーにする
+"""
+
+import hashlib
+import json
+import unicodedata
+from pathlib import Path
+from datetime import datetime
+
+from output_manifest import atomic_output
+
+# 列の対応付けを保存するファイル名
+COLUMN_MAP_CACHE_FILENAME = 'column_map_cache.json'
+
+class ColumnResolutionError(ValueError):
+    """出力列に対応する元データの列を一意に決められない場合のエラー"""
+
+def normalize_header(name):
+    """
+    列名を比較用に正規化する（NFKC正規化・前後の空白除去・大文字小文字の同一視）
+
+    Args:
+        name (str): 列名
+
+    Returns:
+        str: 正規化後の列名
+    """
+    return unicodedata.normalize('NFKC', str(name)).strip().casefold()
+
+class ColumnResolver:
+    """列名解決クラス"""
+
+    def __init__(self, column_definitions, cache_path=None):
+        """
+        初期化
+
+        Args:
+            column_definitions (list): 出力列の定義（'title'と'source_keywords'を持つdictのリスト）。
+                source_keywordsは元データの列名を優先順に並べたもの（正規化後の完全一致で比較）
+            cache_path (str, optional): 対応付けの保存先。Noneの場合は保存しない
+        """
+        # キーワードは初期化時に1回だけ正規化しておく（正規化後に同じになるキーワードは1つにまとめる）
+        self.rules = [
+            {
+                'title': col_def['title'],
+                'keywords': list(col_def['source_keywords']),
+                'normalized': list(dict.fromkeys(normalize_header(keyword) for keyword in col_def['source_keywords']))
+            }
+            for col_def in column_definitions
+        ]
+        # キーワード定義を変更した場合に保存済みの対応付けを使わないよう、定義のハッシュを記録する
+        self.rules_hash = hashlib.sha256(
+            json.dumps([[rule['title'], rule['keywords']] for rule in self.rules], ensure_ascii=False).encode('utf-8')
+        ).hexdigest()[:16]
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.cache = self._load_cache()
+
+    def _load_cache(self):
+        """保存済みの対応付けを読み込む"""
+        if self.cache_path is None or not self.cache_path.exists():
+            return {}
+        with open(self.cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_cache(self):
+        """対応付けを一時ファイル経由で保存する"""
+        if self.cache_path is None:
+            return
+        self.cache_path.parent.mkdir(exist_ok=True)
+        with atomic_output(self.cache_path) as temp_path:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.cache, f, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def fingerprint(columns):
+        """
+        見出し行の指紋を計算する
+
+        Args:
+            columns (list): 列名のリスト
+
+        Returns:
+            str: 列名の並びから計算したハッシュ
+        """
+        return hashlib.sha256('\x1f'.join(str(col) for col in columns).encode('utf-8')).hexdigest()[:16]
+
+    def _resolve_rule(self, rule, columns, normalized_columns):
+        """
+        1つの出力列について元データの列を決定する
+
+        キーワードを優先順に調べ、最初に一致したキーワードの列を採用する。
+        そのキーワードに一致する列が複数ある場合は一意に決められないため、候補として返す
+
+        Args:
+            rule (dict): 正規化済みのキーワード定義
+            columns (list): 列名のリスト
+            normalized_columns (list): 正規化後の列名のリスト
+
+        Returns:
+            tuple: (採用した列名またはNone, 同じキーワードに一致した候補の列名リスト, 部分一致の候補の列名リスト)
+        """
+        for keyword in rule['normalized']:
+            candidates = [col for col, name in zip(columns, normalized_columns) if name == keyword]
+            if candidates:
+                return candidates[0], candidates, []
+        # 完全一致しない場合の参考情報（strict=Falseの場合のみ使用）
+        partial = [col for col, name in zip(columns, normalized_columns)
+                   if any(keyword in name for keyword in rule['normalized'])]
+        return None, [], partial
+
+    def resolve(self, columns, strict=True):
+        """
+        元データの列名から出力列の対応付けを取得する
+
+        Args:
+            columns (list): 元データの列名リスト
+            strict (bool): Trueの場合、完全一致する列がない出力列や候補が複数ある出力列があれば
+                ColumnResolutionErrorを送出する。Falseの場合は警告を表示し、完全一致しない出力列には
+                部分一致の先頭の列を使用する
+
+        Returns:
+            dict: 出力列のタイトル -> 元データの列名（見つからない場合はNone）
+        """
+        columns = [str(col) for col in columns]
+        key = self.fingerprint(columns)
+
+        entry = self.cache.get(key)
+        if entry is None or not self._is_valid(entry, columns):
+            entry = self._resolve_fresh(key, columns)
+
+        missing = [title for title, source_col in entry['mapping'].items() if source_col is None]
+        if strict and (missing or entry['ambiguities']):
+            problems = [f"{title}（候補なし、部分一致: {entry['partial_matches'].get(title) or 'なし'}）" for title in missing]
+            problems += [f"{title}（候補が複数: {candidates}）" for title, candidates in entry['ambiguities'].items()]
+            raise ColumnResolutionError(
+                f"元データのレイアウトが想定と異なります（レイアウト {key}）: {', '.join(problems)}"
+            )
+
+        mapping = dict(entry['mapping'])
+        if not strict:
+            for title in missing:
+                partial = entry['partial_matches'].get(title)
+                if partial:
+                    mapping[title] = partial[0]
+        return mapping
+
+    def _is_valid(self, entry, columns):
+        """保存済みの対応付けが現在の列名・キーワード定義と矛盾しないか検証する"""
+        if entry.get('rules_hash') != self.rules_hash or entry.get('columns') != columns:
+            return False
+        if set(entry.get('mapping', {})) != {rule['title'] for rule in self.rules}:
+            return False
+        return all(source_col is None or source_col in columns for source_col in entry['mapping'].values())
+
+    def _resolve_fresh(self, key, columns):
+        """
+        キーワード定義から対応付けを作成して保存する
+
+        Args:
+            key (str): 見出し行の指紋
+            columns (list): 列名のリスト
+
+        Returns:
+            dict: 'mapping', 'ambiguities', 'partial_matches' を含む保存エントリ
+        """
+        print(f"列の対応付けを作成中（レイアウト {key}）...")
+        normalized_columns = [normalize_header(col) for col in columns]
+        mapping = {}
+        ambiguities = {}
+        partial_matches = {}
+        for rule in self.rules:
+            source_col, candidates, partial = self._resolve_rule(rule, columns, normalized_columns)
+            mapping[rule['title']] = source_col
+            if len(candidates) > 1:
+                ambiguities[rule['title']] = candidates
+            if source_col is None:
+                partial_matches[rule['title']] = partial
+
+        for title, candidates in ambiguities.items():
+            print(f"  警告: {title} の候補が複数あります {candidates}")
+        for title, partial in partial_matches.items():
+            print(f"  警告: {title} に完全一致する列が見つかりません（部分一致: {partial or 'なし'}）")
+
+        entry = {
+            'columns': columns,
+            'rules_hash': self.rules_hash,
+            'mapping': mapping,
+            'ambiguities': ambiguities,
+            'partial_matches': partial_matches,
+            'resolved_at': datetime.now().isoformat()
+        }
+        self.cache[key] = entry
+        self._save_cache()
+        return entry
@@ -11,6 +11,14 @@ import numpy as np
 from pathlib import Path
 from datetime import datetime
 
+from output_manifest import OutputManifest, atomic_output
+from spend_forecaster import SpendForecaster
+from streaming_sketches import HeavyHitters
+from money import normalize_money_columns, aggregate_yen
+
+# グループインデックスを作成する列（'受入月'は受入日から作成）
+INDEX_COLUMNS = ['分類名称_置換後', '仕入先略称', 'ﾌｧｲﾙNO', '受入月']
+
 class DataAnalyzer:
     """データ分析クラス"""
     
@@ -26,6 +34,7 @@ class DataAnalyzer:
         self.metadata = None
         self.statistics = None
         self.df = None
+        self.group_index = {}
         
         # JSONファイルを読み込み
         self.load_json_data()
@@ -40,8 +49,11 @@ class DataAnalyzer:
             self.statistics = json_data.get('statistics', {})
             self.data = json_data.get('data', [])
             
-            # DataFrameに変換
-            self.df = pd.DataFrame(self.data)
+            # DataFrameに変換（金額列は整数の円で保持）
+            self.df = normalize_money_columns(pd.DataFrame(self.data))
+            
+            # 絞り込み用のグループインデックスを作成
+            self.build_group_index()
             
             print(f"データ読み込み完了: {len(self.df)}行, {len(self.df.columns)}列")
             print(f"ファイルNO: {self.metadata.get('file_no', 'Unknown')}")
@@ -72,24 +84,124 @@ class DataAnalyzer:
         """pandas DataFrameを取得"""
         return self.df
     
+    def build_group_index(self):
+        """
+        分類・仕入先・ファイルNO・受入月ごとの行位置インデックスを作成
+        
+        読み込み時に1回だけ作成し、filter_byでは全行を走査せずに行位置を参照する
+        （self.dfの行を追加・削除した場合は再作成が必要）
+        """
+        self.group_index = {}
+        for col in INDEX_COLUMNS:
+            if col == '受入月' and '受入日' in self.df.columns:
+                keys = pd.to_datetime(self.df['受入日'], errors='coerce').dt.strftime('%Y-%m')
+            elif col in self.df.columns:
+                keys = self.df[col]
+            else:
+                continue
+            self.group_index[col] = keys.reset_index(drop=True).groupby(keys.to_numpy(), sort=False).indices
+    
+    def _lookup_positions(self, column, values):
+        """
+        グループインデックスから指定値の行位置を取得
+        
+        Args:
+            column (str): 列名
+            values (list): 値のリスト（いずれかに一致する行を返す）
+        
+        Returns:
+            numpy.ndarray: 行位置（昇順）
+        """
+        index = self.group_index[column]
+        # 同じ値を重複して指定しても行位置が重ならないよう、値の重複を除く
+        positions = [index[value] for value in dict.fromkeys(values) if value in index]
+        if not positions:
+            return np.empty(0, dtype='int64')
+        return np.sort(np.concatenate(positions)) if len(positions) > 1 else positions[0]
+    
+    def filter_by(self, criteria):
+        """
+        複数の列の条件で絞り込み（グループインデックスの行位置の積集合）
+        
+        Args:
+            criteria (dict): 列名 -> 値または値のリスト
+                例（名称列は読み込み時にNFKC正規化済みのため全角カナで指定）: {'分類名称_置換後': 'M:購入', '仕入先略称': ['ミスミ', 'MISUMI'], '受入月': '2023-04'}
+        
+        Returns:
+            pandas.DataFrame: 条件に一致する行
+        """
+        positions = None
+        # インデックスのない列は、インデックスで絞り込んだ後の行に対してだけ比較する
+        unindexed = {}
+        
+        # 該当件数の少ない条件から積集合を取る
+        lookups = []
+        for column, values in criteria.items():
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            if column in self.group_index:
+                lookups.append(self._lookup_positions(column, values))
+            elif column in self.df.columns:
+                unindexed[column] = list(values)
+            else:
+                return pd.DataFrame()
+        
+        for found in sorted(lookups, key=len):
+            positions = found if positions is None else np.intersect1d(positions, found, assume_unique=True)
+            if len(positions) == 0:
+                break
+        
+        result = self.df if positions is None else self.df.iloc[positions]
+        for column, values in unindexed.items():
+            result = result[result[column].isin(values)]
+        return result
+    
     def filter_by_category(self, category_name):
         """分類名称でフィルタリング"""
         if '分類名称_置換後' in self.df.columns:
-            return self.df[self.df['分類名称_置換後'] == category_name]
+            return self.filter_by({'分類名称_置換後': category_name})
         return pd.DataFrame()
     
     def get_category_summary(self):
         """分類別の集計を取得"""
         if '分類名称_置換後' in self.df.columns and '受入金額' in self.df.columns:
-            return self.df.groupby('分類名称_置換後')['受入金額'].agg(['count', 'sum', 'mean']).reset_index()
+            return aggregate_yen(self.df, '分類名称_置換後', include_mean=True)
         return pd.DataFrame()
     
     def get_supplier_summary(self):
         """仕入先別の集計を取得"""
         if '仕入先略称' in self.df.columns and '受入金額' in self.df.columns:
-            return self.df.groupby('仕入先略称')['受入金額'].agg(['count', 'sum', 'mean']).reset_index()
+            return aggregate_yen(self.df, '仕入先略称', include_mean=True)
         return pd.DataFrame()
     
+    def get_approximate_supplier_summary(self, top_n=20, capacity=256, chunk_size=100000):
+        """
+        仕入先別の上位集計を固定メモリのスケッチで近似取得（大量データ向け）
+        
+        Args:
+            top_n (int): 取得する仕入先数（金額の多い順）
+            capacity (int): スケッチのカウンタ数（推定誤差は総数/(capacity+1)以下）
+            chunk_size (int): チャンクの行数
+        
+        Returns:
+            pandas.DataFrame: 仕入先略称・推定件数・推定合計金額（いずれも下限値）
+        """
+        if '仕入先略称' not in self.df.columns or '受入金額' not in self.df.columns:
+            return pd.DataFrame()
+        
+        counts = HeavyHitters(capacity)
+        amounts = HeavyHitters(capacity)
+        for start in range(0, len(self.df), chunk_size):
+            chunk = self.df.iloc[start:start + chunk_size]
+            counts.update(chunk['仕入先略称'])
+            amounts.update(chunk['仕入先略称'], weights=chunk['受入金額'].fillna(0).clip(lower=0))
+        
+        top_amounts = amounts.top(top_n)
+        return pd.DataFrame({
+            '仕入先略称': top_amounts.index,
+            'count': counts.counters.reindex(top_amounts.index, fill_value=0).round().astype('int64').to_numpy(),
+            'sum': top_amounts.round().astype('int64').to_numpy()
+        })
+    
     def get_monthly_summary(self):
         """月別の集計を取得"""
         if '受入日' in self.df.columns and '受入金額' in self.df.columns:
@@ -97,7 +209,22 @@ class DataAnalyzer:
             self.df['受入日'] = pd.to_datetime(self.df['受入日'], errors='coerce')
             self.df['受入月'] = self.df['受入日'].dt.strftime('%Y-%m')
             
-            return self.df.groupby('受入月')['受入金額'].agg(['count', 'sum', 'mean']).reset_index()
+            return aggregate_yen(self.df, '受入月', include_mean=True)
+        return pd.DataFrame()
+    
+    def get_spend_forecast(self, group_column='分類名称_置換後', horizon=6):
+        """
+        仕入先別・分類別の月次仕入金額を予測
+        
+        Args:
+            group_column (str): 予測の単位となる列（'分類名称_置換後'、'仕入先略称'など）
+            horizon (int): 予測する月数
+        
+        Returns:
+            pandas.DataFrame: 系列・予測月ごとの予測金額
+        """
+        if group_column in self.df.columns and '受入日' in self.df.columns and '受入金額' in self.df.columns:
+            return SpendForecaster().forecast(self.df, group_column, horizon=horizon)
         return pd.DataFrame()
     
     def export_analysis_results(self, output_dir="ReportOutput"):
@@ -120,28 +247,37 @@ class DataAnalyzer:
             'category_summary': self.get_category_summary().to_dict('records'),
             'supplier_summary': self.get_supplier_summary().to_dict('records'),
             'monthly_summary': self.get_monthly_summary().to_dict('records'),
+            'category_forecast': self.get_spend_forecast('分類名称_置換後').to_dict('records'),
             'statistics': self.statistics
         }
         
-        # JSONファイルに出力
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(analysis_results, f, ensure_ascii=False, indent=2)
+        # JSONファイルに出力（一時ファイルに書き込んでから置き換え）
+        with atomic_output(file_path) as temp_path:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(analysis_results, f, ensure_ascii=False, indent=2)
+        
+        OutputManifest(output_path).record(file_path, 'analysis_json', row_count=len(self.df),
+                                           details={'source_file': str(self.json_file_path)})
         
         print(f"分析結果を出力しました: {file_path}")
         return str(file_path)
 
 def main():
     """テスト用メイン関数"""
-    # 最新のJSONファイルを自動検索
-    output_dir = Path("ReportOutput")
-    json_files = list(output_dir.glob("purchase_report_*.json"))
+    # マニフェストから最新のJSONファイルを取得
+    manifest = OutputManifest("ReportOutput")
+    latest_entry = manifest.latest('report_json')
     
-    if not json_files:
+    # マニフェスト未作成の場合は既存ファイルを一度だけ登録
+    if latest_entry is None and not manifest.manifest_path.exists():
+        manifest.rebuild()
+        latest_entry = manifest.latest('report_json')
+    
+    if latest_entry is None or latest_entry.get('compressed'):
         print("JSONファイルが見つかりません")
         return
     
-    # 最新のファイルを使用
-    latest_file = max(json_files, key=lambda x: x.stat().st_mtime)
+    latest_file = manifest.resolve_path(latest_entry)
     print(f"分析対象ファイル: {latest_file}")
     
     # データ分析を実行
@@ -164,6 +300,11 @@ def main():
     supplier_summary = analyzer.get_supplier_summary()
     print(supplier_summary.head(10))
     
+    # 分類別の仕入金額予測を表示
+    print("\n=== 分類別仕入金額予測 ===")
+    category_forecast = analyzer.get_spend_forecast('分類名称_置換後')
+    print(category_forecast.head(12))
+    
     # 分析結果を出力
     analyzer.export_analysis_results()
 
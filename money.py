@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+金額ユーティリティ
+受入金額を整数（円）で扱い、浮動小数点の丸め誤差やint64のオーバーフローなしに集計する
+受入単価は円未満の端数（銭）を含むため丸めずに数値として保持する
+"""
+
+import numpy as np
+import pandas as pd
+
+# 整数（円）で保持する金額列
+MONEY_COLUMNS = ['受入金額']
+
+# 明細金額の検算に使用する列
+QUANTITY_COLUMN = '受入数量'
+UNIT_PRICE_COLUMN = '受入単価'
+AMOUNT_COLUMN = '受入金額'
+
+INT64_MAX = np.iinfo('int64').max
+
+def to_yen(values):
+    """
+    金額を整数（円）に変換する（欠損値は0、端数は四捨五入）
+
+    Args:
+        values (pandas.Series): 金額
+
+    Returns:
+        pandas.Series: int64の金額
+    """
+    numbers = pd.to_numeric(pd.Series(values), errors='coerce').fillna(0).astype('float64')
+    rounded = np.sign(numbers) * np.floor(np.abs(numbers) + 0.5)
+    if len(rounded) > 0 and np.abs(rounded).max() > INT64_MAX:
+        raise OverflowError("金額がint64の範囲を超えています")
+    return rounded.astype('int64')
+
+def to_unit_price(values):
+    """
+    単価を数値に変換する（円未満の端数は丸めない、数値に変換できない値は欠損値）
+
+    Args:
+        values (pandas.Series): 単価
+
+    Returns:
+        pandas.Series: float64の単価
+    """
+    return pd.to_numeric(pd.Series(values), errors='coerce').astype('float64')
+
+def to_quantity(values):
+    """
+    数量を数値に変換する（欠損値は0）
+
+    小数の数量（例: 163.5）は受入数量×受入単価が受入金額と一致するよう丸めずに返し、
+    すべて整数の場合はint64で返す
+
+    Args:
+        values (pandas.Series): 数量
+
+    Returns:
+        pandas.Series: int64またはfloat64の数量
+    """
+    numbers = pd.to_numeric(pd.Series(values), errors='coerce').fillna(0).astype('float64')
+    fractional = count_fractional(numbers)
+    if fractional > 0:
+        print(f"  警告: 数量の {fractional}件に小数があるため丸めずに出力します")
+        return numbers
+    return numbers.astype('int64')
+
+def count_fractional(values):
+    """
+    整数でない金額（円未満の端数を持つ値）の件数を数える
+
+    Args:
+        values (pandas.Series): 金額
+
+    Returns:
+        int: 端数を持つ値の件数
+    """
+    numbers = pd.to_numeric(pd.Series(values), errors='coerce').dropna().to_numpy(dtype='float64')
+    return int(np.count_nonzero(numbers != np.round(numbers)))
+
+def normalize_money_columns(data, columns=None):
+    """
+    金額列を整数（円）に、単価列を丸めない数値に変換する
+
+    Args:
+        data (pandas.DataFrame): 対象データ
+        columns (list, optional): 整数（円）に変換する列。Noneの場合はMONEY_COLUMNS
+
+    Returns:
+        pandas.DataFrame: 金額列がint64、単価列がfloat64に変換されたデータ
+    """
+    converted = data.copy()
+    for col in columns or MONEY_COLUMNS:
+        if col not in converted.columns:
+            continue
+        fractional = count_fractional(converted[col])
+        if fractional > 0:
+            print(f"  警告: {col} の {fractional}件に円未満の端数があるため四捨五入しました")
+        converted[col] = to_yen(converted[col])
+    if UNIT_PRICE_COLUMN in converted.columns:
+        converted[UNIT_PRICE_COLUMN] = to_unit_price(converted[UNIT_PRICE_COLUMN])
+    return converted
+
+def find_line_total_mismatches(data, tolerance=1):
+    """
+    受入金額が受入数量×受入単価と一致しない明細を検出する
+
+    Args:
+        data (pandas.DataFrame): 対象データ
+        tolerance (int): 許容する差額（円）
+
+    Returns:
+        pandas.Series: 不一致の場合Trueとなる真偽値（必要な列がない場合はすべてFalse）
+    """
+    if not {QUANTITY_COLUMN, UNIT_PRICE_COLUMN, AMOUNT_COLUMN} <= set(data.columns):
+        return pd.Series(False, index=data.index)
+
+    quantity = pd.to_numeric(data[QUANTITY_COLUMN], errors='coerce').fillna(0).to_numpy(dtype='float64')
+    unit_price = pd.to_numeric(data[UNIT_PRICE_COLUMN], errors='coerce').fillna(0).to_numpy(dtype='float64')
+    amount = pd.to_numeric(data[AMOUNT_COLUMN], errors='coerce').fillna(0).to_numpy(dtype='float64')
+
+    expected = np.sign(quantity * unit_price) * np.floor(np.abs(quantity * unit_price) + 0.5)
+    return pd.Series(np.abs(expected - amount) > tolerance, index=data.index)
+
+def _is_sum_safe(values):
+    """件数×最大絶対値がint64に収まる（どの部分和もオーバーフローしない）か判定する"""
+    if len(values) == 0:
+        return True
+    max_abs = int(np.abs(values).max())
+    return max_abs == 0 or len(values) <= INT64_MAX // max_abs
+
+def sum_yen(values):
+    """
+    金額をオーバーフローなしに合計する
+
+    Args:
+        values (pandas.Series): int64の金額
+
+    Returns:
+        int: 合計金額
+    """
+    array = to_yen(values).to_numpy()
+    if _is_sum_safe(array):
+        return int(array.sum())
+    # int64に収まらない可能性がある場合はPythonの整数（任意精度）で合計
+    return sum(int(v) for v in array)
+
+def aggregate_yen(data, keys, column=AMOUNT_COLUMN, include_mean=False):
+    """
+    グループごとの件数・合計金額（・平均金額）を集計する
+
+    Args:
+        data (pandas.DataFrame): 対象データ
+        keys (str or list): グループ化する列
+        column (str): 金額列
+        include_mean (bool): Trueの場合は平均金額も集計する
+
+    Returns:
+        pandas.DataFrame: グループ列と 'count', 'sum'（, 'mean'）列
+    """
+    amounts = to_yen(data[column])
+    grouped = amounts.groupby([data[key] for key in ([keys] if isinstance(keys, str) else keys)])
+
+    if _is_sum_safe(amounts.to_numpy()):
+        result = grouped.agg(['count', 'sum'])
+    else:
+        result = pd.DataFrame({'count': grouped.count(), 'sum': grouped.agg(sum_yen)})
+
+    if include_mean:
+        result['mean'] = result['sum'] / result['count']
+    return result.reset_index()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+名称正規化ユーティリティ
+仕入先名・メーカー名の表記揺れ（半角カナ、全角英数、余分な空白、'nan'文字列）を統一する
+"""
+
+import json
+import re
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 正規化対象の列
+NORMALIZE_COLUMNS = ['仕入先略称', 'ﾒｰｶｰ名']
+
+# 別名テーブルのファイル名（利用者が管理する {正式名称: [別名, ...]} 形式のJSON）
+ALIAS_TABLE_FILENAME = 'name_aliases.json'
+
+# 欠損値として扱う文字列（文字化け修正で文字列化された欠損値を含む）
+MISSING_TOKENS = {'', 'nan', 'none', 'null', 'nat'}
+
+class NameNormalizer:
+    """名称正規化クラス（異なる値ごとに1回だけ正規化する）"""
+
+    def __init__(self, alias_path=None, cache_size=4096):
+        """
+        初期化
+
+        Args:
+            alias_path (str, optional): 別名テーブルのパス。Noneの場合はカレントディレクトリのALIAS_TABLE_FILENAME（存在する場合のみ）
+            cache_size (int): 正規化結果を保持する件数の上限
+        """
+        self.alias_path = Path(alias_path) if alias_path else Path(ALIAS_TABLE_FILENAME)
+        self.aliases = self._load_aliases()
+        self._normalize_cached = lru_cache(maxsize=cache_size)(self._normalize_value)
+
+    def _load_aliases(self):
+        """
+        別名テーブルを読み込む
+
+        Returns:
+            dict: 正規化済みの別名 -> 正式名称
+        """
+        if not self.alias_path.exists():
+            return {}
+
+        with open(self.alias_path, 'r', encoding='utf-8') as f:
+            table = json.load(f)
+
+        aliases = {}
+        for canonical, variants in table.items():
+            canonical_name = self._clean(canonical)
+            aliases[canonical_name] = canonical_name
+            for variant in variants:
+                aliases[self._clean(variant)] = canonical_name
+
+        print(f"別名テーブルを読み込みました: {self.alias_path} ({len(table)}件)")
+        return aliases
+
+    @staticmethod
+    def _clean(value):
+        """NFKC正規化と空白の整理を行う"""
+        text = unicodedata.normalize('NFKC', str(value))
+        text = re.sub(r'\s+', ' ', text).strip()
+        # 文字化け修正で末尾に残った' nan'を除去
+        return re.sub(r'(\s+nan)+$', '', text, flags=re.IGNORECASE)
+
+    def _normalize_value(self, value):
+        """
+        1つの値を正規化する
+
+        Args:
+            value (str): 元の値
+
+        Returns:
+            str: 正規化後の値、欠損値の場合はNone
+        """
+        text = self._clean(value)
+        if text.lower() in MISSING_TOKENS:
+            return None
+        return self.aliases.get(text, text)
+
+    def normalize_series(self, series):
+        """
+        列の値を正規化する（異なる値ごとに1回だけ正規化し、行へ展開する）
+
+        Args:
+            series (pandas.Series): 対象の列
+
+        Returns:
+            pandas.Series: 正規化後の列
+        """
+        codes, uniques = pd.factorize(series)
+        normalized_uniques = np.array(
+            [self._normalize_cached(value) for value in uniques] + [None], dtype=object
+        )
+        # 欠損値のコード(-1)は末尾のNoneを参照する
+        return pd.Series(normalized_uniques[codes], index=series.index, dtype=object).fillna(np.nan)
+
+    def normalize(self, data, columns=None):
+        """
+        データの名称列を正規化する
+
+        Args:
+            data (pandas.DataFrame): 対象データ
+            columns (list, optional): 正規化する列。Noneの場合はNORMALIZE_COLUMNS
+
+        Returns:
+            pandas.DataFrame: 名称が正規化されたデータ
+        """
+        columns = columns or NORMALIZE_COLUMNS
+        normalized = data.copy()
+        for col in columns:
+            if col not in normalized.columns:
+                continue
+            before = normalized[col].nunique()
+            normalized[col] = self.normalize_series(normalized[col])
+            print(f"名称を正規化: {col} ({before}種類 -> {normalized[col].nunique()}種類)")
+        return normalized
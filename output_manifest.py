@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+出力マニフェスト管理
+ReportOutputディレクトリに出力したファイルの情報を追記専用のマニフェストに記録する
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from money import sum_yen
+
+# マニフェストファイル名（1行1エントリのJSON Lines形式）
+MANIFEST_FILENAME = 'manifest.jsonl'
+
+# 出力ファイルの種類（ファイル名パターン -> 種類）
+OUTPUT_KINDS = {
+    'purchase_report_*.json': 'report_json',
+    'purchase_report_*.csv': 'report_csv',
+    'purchase_report_*.xlsx': 'report_excel',
+    'purchase_summary_*.json': 'summary_json',
+    'purchase_diff_*.json': 'diff_json',
+    'purchase_diff_*.xlsx': 'diff_excel',
+    'analysis_results_*.json': 'analysis_json',
+    'partition_index_*.json': 'partition_index'
+}
+
+# 保持ポリシーで圧縮対象とする種類（Excelは圧縮済み形式のため対象外）
+COMPRESSIBLE_KINDS = {'report_json', 'report_csv', 'summary_json', 'diff_json', 'analysis_json'}
+
+@contextmanager
+def atomic_output(file_path):
+    """
+    一時ファイルに書き込み、完了後に出力先へ置き換える（途中で失敗しても書きかけのファイルを残さない）
+
+    Args:
+        file_path (pathlib.Path): 最終的な出力先のパス
+
+    Yields:
+        pathlib.Path: 書き込み先の一時ファイルのパス（拡張子は出力先と同じ）
+    """
+    file_path = Path(file_path)
+    temp_path = file_path.with_name(f".{file_path.stem}.tmp{file_path.suffix}")
+    try:
+        yield temp_path
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if temp_path.exists():
+            temp_path.unlink()
+        raise
+
+def compute_file_hash(file_path, chunk_size=1024 * 1024):
+    """
+    ファイル内容のSHA-256ハッシュを計算する
+
+    Args:
+        file_path (str): 対象ファイルのパス
+        chunk_size (int): 読み込み単位（バイト）
+
+    Returns:
+        str: 16進数のハッシュ値
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class OutputManifest:
+    """出力マニフェスト管理クラス"""
+
+    def __init__(self, output_dir="ReportOutput"):
+        """
+        初期化
+
+        Args:
+            output_dir (str): 出力ディレクトリのパス
+        """
+        self.output_dir = Path(output_dir)
+        self.manifest_path = self.output_dir / MANIFEST_FILENAME
+
+    def _append(self, entry):
+        """エントリを1行追記する"""
+        self.output_dir.mkdir(exist_ok=True)
+        with open(self.manifest_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record(self, file_path, kind, row_count=None, totals=None, source_hash=None, details=None, created_at=None):
+        """
+        出力ファイルをマニフェストに記録する
+
+        Args:
+            file_path (str): 出力ファイルのパス
+            kind (str): 出力ファイルの種類（OUTPUT_KINDSの値）
+            row_count (int, optional): 行数
+            totals (dict, optional): 合計値（列名 -> 合計）
+            source_hash (str, optional): 入力ファイルのハッシュ
+            details (dict, optional): 種類ごとの追加情報（分類別集計など）
+            created_at (str, optional): 作成日時（ISO形式）。Noneの場合は現在日時
+
+        Returns:
+            dict: 記録したエントリ
+        """
+        file_path = Path(file_path)
+        # マニフェストを新規作成する場合は、先に既存の出力ファイルを登録する（一覧・保持ポリシーの対象から漏れないように）
+        if not self.manifest_path.exists():
+            self.rebuild(exclude=[file_path.name])
+        return self._record(file_path, kind, row_count, totals, source_hash, details, created_at)
+
+    def _record(self, file_path, kind, row_count, totals, source_hash, details, created_at):
+        """エントリを作成して追記する（recordの引数と同じ）"""
+        entry = {
+            'event': 'created',
+            'path': file_path.name,
+            'kind': kind,
+            'size': file_path.stat().st_size if file_path.exists() else None,
+            'row_count': row_count,
+            'totals': totals or {},
+            'source_hash': source_hash,
+            'created_at': created_at or datetime.now().isoformat(),
+            'details': details or {}
+        }
+        self._append(entry)
+        return entry
+
+    def read_events(self):
+        """
+        マニフェストの全イベントを読み込む
+
+        Returns:
+            list: イベントのリスト（記録順）
+        """
+        if not self.manifest_path.exists():
+            return []
+
+        events = []
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    events.append(json.loads(line))
+        return events
+
+    def entries(self, kind=None):
+        """
+        現在存在する出力ファイルのエントリを取得する
+
+        圧縮・削除イベントを順に適用し、ファイルごとの最新状態を返す
+
+        Args:
+            kind (str, optional): 種類で絞り込む場合に指定
+
+        Returns:
+            list: エントリのリスト（作成順）
+        """
+        current = {}
+        for event in self.read_events():
+            action = event.get('event', 'created')
+            if action == 'created':
+                current[event['path']] = event
+            elif action == 'compressed' and event['path'] in current:
+                entry = dict(current.pop(event['path']))
+                entry['path'] = event['compressed_path']
+                entry['size'] = event.get('size')
+                entry['compressed'] = True
+                current[event['compressed_path']] = entry
+            elif action == 'pruned':
+                current.pop(event['path'], None)
+
+        entries = list(current.values())
+        if kind is not None:
+            entries = [entry for entry in entries if entry['kind'] == kind]
+        return entries
+
+    def latest(self, kind):
+        """
+        指定した種類の最新エントリを取得する
+
+        Args:
+            kind (str): 出力ファイルの種類
+
+        Returns:
+            dict: 最新のエントリ、存在しない場合はNone
+        """
+        entries = self.entries(kind)
+        if not entries:
+            return None
+        return max(entries, key=lambda entry: entry['created_at'])
+
+    def resolve_path(self, entry):
+        """
+        エントリのファイルパスを取得する
+
+        Args:
+            entry (dict): マニフェストのエントリ
+
+        Returns:
+            pathlib.Path: 出力ファイルのパス
+        """
+        return self.output_dir / entry['path']
+
+    def rebuild(self, exclude=None):
+        """
+        マニフェストに未登録の既存出力ファイルを登録する（初回のみ内容を読み込む）
+
+        Args:
+            exclude (list, optional): 登録しないファイル名（これから記録するファイルなど）
+
+        Returns:
+            int: 登録したファイル数
+        """
+        known = {entry['path'] for entry in self.entries()} | set(exclude or [])
+        registered = 0
+
+        for pattern, kind in OUTPUT_KINDS.items():
+            for file_path in sorted(self.output_dir.glob(pattern)):
+                if file_path.name in known:
+                    continue
+                row_count, totals, details = self._inspect_artifact(file_path, kind)
+                # 既存ファイルの作成日時はファイル内の生成日時、なければ更新日時を使用
+                created_at = details.pop('generated_at', None) or datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
+                self._record(file_path, kind, row_count, totals, None, details, created_at)
+                known.add(file_path.name)
+                registered += 1
+
+        print(f"マニフェストに{registered}件のファイルを登録しました")
+        return registered
+
+    def _write_lines(self, lines):
+        """マニフェストを一時ファイル経由で書き換える"""
+        temp_path = self.manifest_path.with_name(f".{self.manifest_path.name}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.manifest_path)
+
+    def _inspect_artifact(self, file_path, kind):
+        """
+        既存の出力ファイルを読み込んでエントリ情報を作成する
+
+        Args:
+            file_path (pathlib.Path): 出力ファイルのパス
+            kind (str): 出力ファイルの種類
+
+        Returns:
+            tuple: (行数, 合計値, 追加情報)
+        """
+        if kind == 'summary_json':
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            details = build_summary_details(data['category_summary'], data['file_summary'])
+            details['generated_at'] = data['metadata'].get('generated_at')
+            return len(data['category_summary']), {'合計金額': sum(row['合計金額'] for row in data['category_summary'])}, details
+
+        if kind == 'diff_json':
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            metadata = data.get('metadata', {})
+            counts = {key: metadata.get(key, 0) for key in ('added_count', 'removed_count', 'changed_count')}
+            category_delta = data.get('category_delta', [])
+            totals = {'金額差分': sum(row.get('金額差分') or 0 for row in category_delta)} if category_delta else {}
+            return sum(counts.values()), totals, dict(counts, generated_at=metadata.get('generated_at'))
+
+        if kind in ('report_json', 'analysis_json'):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            records = data.get('data', [])
+            totals = {'受入金額': sum(row.get('受入金額') or 0 for row in records)} if records else {}
+            metadata = data.get('metadata', {})
+            details = {'file_no': metadata.get('file_no'), 'generated_at': metadata.get('generated_at') or metadata.get('analyzed_at')}
+            return len(records) if records else None, totals, details
+
+        if kind == 'report_csv':
+            df = pd.read_csv(file_path, encoding='utf-8-sig')
+            return len(df), build_totals(df), build_csv_details(df)
+
+        if kind in ('report_excel', 'diff_excel'):
+            df = pd.read_excel(file_path, engine='openpyxl')
+            return len(df), {}, {'columns': list(df.columns)}
+
+        if kind == 'partition_index':
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            metadata = data.get('metadata', {})
+            totals = {'受入金額': sum(p.get('totals', {}).get('受入金額', 0) for p in data.get('partitions', []))}
+            # パーティションのディレクトリはインデックスファイルと同じ分割単位・タイムスタンプの名前
+            details = {'partition_by': metadata.get('partition_by'), 'partition_count': metadata.get('partition_count'),
+                       'partition_dir': file_path.stem.replace('partition_index_', 'partitions_', 1),
+                       'generated_at': metadata.get('generated_at')}
+            return metadata.get('total_records'), totals, details
+
+        return None, {}, {}
+
+    def apply_retention(self, compress_after_days=30, delete_after_days=180):
+        """
+        保持ポリシーを適用する（古いファイルを圧縮・削除し、マニフェストを整理）
+
+        Args:
+            compress_after_days (int): この日数を過ぎたJSON/CSVをgzip圧縮する
+            delete_after_days (int): この日数を過ぎたファイルを削除する
+
+        Returns:
+            dict: 'compressed'と'pruned'の件数
+        """
+        now = datetime.now()
+        compressed = 0
+        pruned = 0
+
+        for entry in self.entries():
+            age = now - datetime.fromisoformat(entry['created_at'])
+            file_path = self.resolve_path(entry)
+
+            if age > timedelta(days=delete_after_days):
+                if file_path.exists():
+                    file_path.unlink()
+                # パーティション出力はインデックスと一緒にディレクトリごと削除
+                partition_dir = entry['details'].get('partition_dir')
+                if partition_dir and (self.output_dir / partition_dir).is_dir():
+                    shutil.rmtree(self.output_dir / partition_dir)
+                self._append({'event': 'pruned', 'path': entry['path'], 'at': now.isoformat()})
+                pruned += 1
+
+            elif (age > timedelta(days=compress_after_days) and entry['kind'] in COMPRESSIBLE_KINDS
+                  and not entry.get('compressed') and file_path.exists()):
+                compressed_path = file_path.with_name(file_path.name + '.gz')
+                with open(file_path, 'rb') as src, gzip.open(compressed_path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                file_path.unlink()
+                self._append({'event': 'compressed', 'path': entry['path'], 'compressed_path': compressed_path.name,
+                              'size': compressed_path.stat().st_size, 'at': now.isoformat()})
+                compressed += 1
+
+        self.compact()
+        print(f"保持ポリシーを適用しました: 圧縮 {compressed}件, 削除 {pruned}件")
+        return {'compressed': compressed, 'pruned': pruned}
+
+    def compact(self):
+        """現在存在するファイルのエントリだけでマニフェストを書き直す"""
+        if not self.manifest_path.exists():
+            return
+        lines = [json.dumps(entry, ensure_ascii=False, default=str) + '\n' for entry in self.entries()]
+        self._write_lines(lines)
+
+def build_totals(data):
+    """
+    明細データの合計値を作成する
+
+    Args:
+        data (pandas.DataFrame): 明細データ
+
+    Returns:
+        dict: 合計値（列名 -> 合計）
+    """
+    if '受入金額' in data.columns:
+        return {'受入金額': sum_yen(data['受入金額'])}
+    return {}
+
+def build_csv_details(data):
+    """
+    明細CSVのマニフェスト用追加情報を作成する
+
+    Args:
+        data (pandas.DataFrame): 明細データ
+
+    Returns:
+        dict: 列名と分類別件数
+    """
+    details = {'columns': list(data.columns)}
+    if '分類名称_置換後' in data.columns:
+        details['category_counts'] = {str(k): int(v) for k, v in data['分類名称_置換後'].value_counts().items()}
+    return details
+
+def build_summary_details(category_records, file_records):
+    """
+    集計JSONのマニフェスト用追加情報を作成する
+
+    Args:
+        category_records (list): 分類別集計のレコード
+        file_records (list): ファイル別集計のレコード
+
+    Returns:
+        dict: 分類数・ファイル数と各集計
+    """
+    return {
+        'category_count': len(category_records),
+        'file_count': len(file_records),
+        'category_summary': [
+            {'分類名称（置換後）': row['分類名称（置換後）'], '件数': row['件数'], '合計金額': row['合計金額']}
+            for row in category_records
+        ],
+        'file_summary': [
+            {'ファイルNO': row['ファイルNO'], '件数': row['件数'], '合計金額': row['合計金額']}
+            for row in file_records
+        ]
+    }
@@ -6,13 +6,26 @@
 """
 
 import pandas as pd
+import numpy as np
 import os
+import re
 import json
+import hashlib
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import math
+import time
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
+from streaming_sketches import DataProfiler
+from name_normalizer import NameNormalizer
+from money import to_unit_price, to_quantity, sum_yen, normalize_money_columns, find_line_total_mismatches, aggregate_yen
+from output_manifest import OutputManifest, atomic_output, compute_file_hash, build_totals, build_csv_details, build_summary_details
+from column_resolver import ColumnResolver, COLUMN_MAP_CACHE_FILENAME
+
 # 分類置換テーブル（分類コード -> 置換名称）
 CATEGORY_MAPPING = {
     '02': 'E:盤組',
@@ -42,12 +55,13 @@ CATEGORY_MAPPING = {
 }
 
 # Excel出力パターンの列定義とマッピング情報
+# source_keywordsは元データの列名を優先順に並べたもの（半角・全角の違いを除いた完全一致で比較、column_resolver.py参照）
 EXCEL_OUTPUT_COLUMNS = [
     {
         'column': 'A',
         'title': '分類コード',
         'description': '分類コード（整数として表示）',
-        'source_keywords': ['分類', 'コード', '分類ｺｰﾄﾞ'],
+        'source_keywords': ['分類ｺｰﾄﾞ', '分類コード'],
         'data_type': 'int',
         'transformation': 'safe_int_convert_category'
     },
@@ -79,7 +93,7 @@ EXCEL_OUTPUT_COLUMNS = [
         'column': 'E',
         'title': 'ファイルNo.',
         'description': 'ファイル番号',
-        'source_keywords': ['ﾌｧｲﾙNO', 'ファイル', 'NO'],
+        'source_keywords': ['ﾌｧｲﾙNO', 'ファイルNo.'],
         'data_type': 'string',
         'transformation': 'direct_copy'
     },
@@ -87,7 +101,7 @@ EXCEL_OUTPUT_COLUMNS = [
         'column': 'F',
         'title': 'UNIT',
         'description': 'ユニット番号',
-        'source_keywords': ['ﾕﾆｯﾄNO', 'UNIT', 'ユニット'],
+        'source_keywords': ['ﾕﾆｯﾄNO', 'UNIT'],
         'data_type': 'string',
         'transformation': 'direct_copy'
     },
@@ -119,62 +133,208 @@ EXCEL_OUTPUT_COLUMNS = [
         'column': 'J',
         'title': '材質・型式',
         'description': '材質・型式',
-        'source_keywords': ['材質・型式', '材質', '型式'],
+        'source_keywords': ['材質・型式'],
         'data_type': 'string',
         'transformation': 'direct_copy'
     },
     {
         'column': 'K',
         'title': '数',
-        'description': '受入数量（単位なし、整数）',
-        'source_keywords': ['受入数量', '数量', '数'],
-        'data_type': 'int',
+        'description': '受入数量（単位なし、小数の数量は丸めない）',
+        'source_keywords': ['受入数量', '数量'],
+        'data_type': 'float',
         'transformation': 'quantity_convert'
     },
     {
         'column': 'L',
         'title': '受入日',
         'description': '受入日（納入日の日付データをそのまま）',
-        'source_keywords': ['納入日', '受入日'],
+        'source_keywords': ['受入日', '納入日'],
         'data_type': 'date',
         'transformation': 'direct_copy'
     },
     {
         'column': 'M',
         'title': '単価',
-        'description': '受入単価（数値として表示）',
+        'description': '受入単価（円未満の端数を含む数値として表示）',
         'source_keywords': ['受入単価', '単価'],
         'data_type': 'float',
         'transformation': 'price_convert'
     }
 ]
 
+# 重複除外に使用するキー列（期間が重なる複数エクスポートの同一行判定用）
+DEDUP_KEY_COLUMNS = ['ﾌｧｲﾙNO', 'ﾕﾆｯﾄNO', '部品番号', '仕入先ｺｰﾄﾞ', '受入日', '発注NO', '受入数量', '受入単価', '受入金額']
+
+# 重複フラグ列の名前（action='flag'の場合に付与）
+DUPLICATE_FLAG_COLUMN = '重複フラグ'
+
+# 実行をまたいで保持するフィンガープリントインデックスのファイル名
+FINGERPRINT_INDEX_FILENAME = 'fingerprint_index.npy'
+
+# Excel読み込みエンジンの優先順（拡張子 -> エンジン名のリスト）
+# calamineはRust実装の高速エンジン（python-calamineが必要）。読み込めない場合は従来のエンジンで読み直す
+EXCEL_READER_ENGINES = {
+    '.xls': ['calamine', 'xlrd'],
+    '.xlsx': ['calamine', 'openpyxl']
+}
+
+# 文字化け修正（latin1 -> shift_jis）が必要なエンジン
+MOJIBAKE_ENGINES = {'xlrd'}
+
+# バッチ処理のチェックポイントファイル名
+BATCH_CHECKPOINT_FILENAME = 'batch_checkpoint.json'
+
+# Excel出力のシート名
+EXCEL_SHEET_NAME = '20250825_オリジナルデータ'
+
+# パーティション出力の分割単位（partition_by -> 分割に使用する列）
+PARTITION_COLUMNS = {
+    'file_no': 'ﾌｧｲﾙNO',
+    'category': '分類名称_置換後'
+}
+
 # 変換ロジックの説明
 TRANSFORMATION_LOGIC = {
     'safe_int_convert_category': '数値に変換可能なもののみ変換、それ以外は0',
     'category_mapping': '分類コードを2桁にゼロパディングし、CATEGORY_MAPPINGで置換',
     'direct_copy': '元データをそのままコピー',
     'safe_int_convert': '数値に変換可能なもののみ変換、それ以外は0（部品番号用）',
-    'quantity_convert': 'NaNを0に変換し、整数として表示',
-    'price_convert': 'NaNを0に変換し、数値として表示'
+    'quantity_convert': 'NaNを0に変換し、整数として表示（小数の数量は丸めずに表示）',
+    'price_convert': 'NaNを0に変換し、数値として表示（円未満の端数は丸めない）'
 }
 
+def compute_row_fingerprints(data, columns):
+    """
+    指定列の値から行ごとの64ビットフィンガープリントを一括計算する
+
+    数値列はfloat64、それ以外は文字列に揃えてからハッシュするため、
+    エクスポートごとに列のdtypeが揺れても同じ値は同じハッシュになる
+
+    Args:
+        data (pandas.DataFrame): 対象データ
+        columns (list): ハッシュ対象の列名リスト（存在しない列は空文字として扱う）
+
+    Returns:
+        numpy.ndarray: 行ごとのフィンガープリント（uint64）
+    """
+    normalized = pd.DataFrame(index=data.index)
+    for col in columns:
+        if col not in data.columns:
+            normalized[col] = ''
+        elif pd.api.types.is_numeric_dtype(data[col]):
+            normalized[col] = data[col].astype('float64')
+        else:
+            normalized[col] = data[col].astype(str)
+
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy(dtype='uint64')
+
+def _contains_sorted(sorted_values, values):
+    """
+    値がソート済み配列に含まれるかを二分探索で判定する
+    
+    Args:
+        sorted_values (numpy.ndarray): ソート済みの配列
+        values (numpy.ndarray): 判定する値
+    
+    Returns:
+        numpy.ndarray: 含まれる場合Trueとなる真偽値
+    """
+    positions = np.searchsorted(sorted_values, values)
+    found = positions < len(sorted_values)
+    contained = np.zeros(len(values), dtype=bool)
+    contained[found] = sorted_values[positions[found]] == values[found]
+    return contained
+
+def _partition_file_stem(key):
+    """
+    パーティションのキーからファイル名に使用できる文字列を作成する
+    
+    Args:
+        key: パーティションのキー（ファイルNOまたは分類名称）
+    
+    Returns:
+        str: ファイル名に使用する文字列
+    """
+    if pd.isna(key) or str(key) in ('', 'nan'):
+        return '未設定'
+    return re.sub(r'[\\/:*?"<>|\s]', '_', str(key))
+
+def _write_partition(partition_dir, stem, formatted_data, detail_data, metadata):
+    """
+    1パーティション分のExcelとJSONを出力する（プロセスプールのワーカーから呼び出す）
+    
+    Args:
+        partition_dir (pathlib.Path): 出力ディレクトリ
+        stem (str): ファイル名（拡張子なし）
+        formatted_data (pandas.DataFrame): Excel出力形式に整形されたデータ
+        detail_data (pandas.DataFrame): 詳細データ
+        metadata (dict): JSONに含めるメタデータ
+    
+    Returns:
+        dict: 'excel'と'json'の出力ファイルパス
+    """
+    excel_path = partition_dir / f"{stem}.xlsx"
+    json_path = partition_dir / f"{stem}.json"
+    
+    with atomic_output(excel_path) as temp_path:
+        formatted_data.to_excel(temp_path, index=False, sheet_name=EXCEL_SHEET_NAME)
+    
+    with atomic_output(json_path) as temp_path:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'metadata': metadata, 'data': detail_data.to_dict('records')}, f, ensure_ascii=False, indent=2, default=str)
+    
+    return {'excel': str(excel_path), 'json': str(json_path)}
+
 class PurchaseReportGenerator:
     """仕入レポート生成クラス"""
     
-    def __init__(self, output_dir="ReportOutput"):
+    def __init__(self, output_dir="ReportOutput", dedup_key_columns=None, use_fingerprint_index=False, alias_path=None,
+                 reader_engine='auto', strict_columns=True):
         """
         初期化
         
         Args:
             output_dir (str): 出力ディレクトリのパス
+            dedup_key_columns (list, optional): 重複判定に使用する列。Noneの場合はDEDUP_KEY_COLUMNS
+            use_fingerprint_index (bool): Trueの場合、フィンガープリントインデックスを実行をまたいで保持する
+            alias_path (str, optional): 仕入先名・メーカー名の別名テーブルのパス
+            reader_engine (str): Excel読み込みエンジン（'auto'、'calamine'、'xlrd'、'openpyxl'）。
+                'auto'の場合はEXCEL_READER_ENGINESの優先順で試行する
+            strict_columns (bool): Trueの場合、出力列に完全一致する列がないファイルや候補が複数あるファイルは
+                読み込み時にエラーにする。Falseの場合は警告を表示し、部分一致する列で続行する
         """
         self.output_dir = Path(output_dir)
         self.original_data = None
         self.category_mapping = None
+        self.dedup_key_columns = dedup_key_columns or DEDUP_KEY_COLUMNS
+        self.use_fingerprint_index = use_fingerprint_index
+        self.fingerprint_index_path = self.output_dir / FINGERPRINT_INDEX_FILENAME
+        self.source_hash = None
+        self.reader_engine = reader_engine
+        self.reader_engine_used = None
+        # 形式に非対応・未インストールのエンジンと拡張子の組（同じ形式では以降試行しない）
+        self.failed_engines = set()
+        self.strict_columns = strict_columns
+        self.column_mapping = None
         
         # 出力ディレクトリが存在しない場合は作成
         self.output_dir.mkdir(exist_ok=True)
+        
+        # 出力ファイルを記録するマニフェスト
+        self.manifest = OutputManifest(self.output_dir)
+        
+        # 仕入先名・メーカー名の正規化（異なる値ごとの結果をキャッシュ）
+        self.name_normalizer = NameNormalizer(alias_path)
+        
+        # 出力列の対応付け（見出し行の指紋ごとに保存し、同じレイアウトでは再利用）
+        self.column_resolver = ColumnResolver(EXCEL_OUTPUT_COLUMNS, self.output_dir / COLUMN_MAP_CACHE_FILENAME)
+        
+        # 取り込み済み行のフィンガープリント（ソート済み）
+        self.seen_fingerprints = self._load_fingerprint_index() if use_fingerprint_index else np.empty(0, dtype='uint64')
+        
+        # 今回の実行で新たに取り込んだ行のフィンガープリント（出力完了後にcommit_fingerprintsで確定）
+        self.pending_fingerprints = np.empty(0, dtype='uint64')
     
     def select_file_dialog(self, title="ファイルを選択してください", file_types=None):
         """
@@ -209,6 +369,36 @@ class PurchaseReportGenerator:
         
         return file_path if file_path else None
     
+    def select_files_dialog(self, title="ファイルを選択してください", file_types=None):
+        """
+        複数ファイル選択ダイアログを表示
+        
+        Args:
+            title (str): ダイアログのタイトル
+            file_types (list): ファイルタイプのリスト [("説明", "拡張子"), ...]
+        
+        Returns:
+            list: 選択されたファイルのパスのリスト、キャンセルされた場合は空リスト
+        """
+        root = tk.Tk()
+        root.withdraw()
+        
+        if file_types is None:
+            file_types = [
+                ("Excelファイル", "*.xlsx *.xls"),
+                ("すべてのファイル", "*.*")
+            ]
+        
+        file_paths = filedialog.askopenfilenames(
+            title=title,
+            filetypes=file_types,
+            initialdir=os.getcwd()
+        )
+        
+        root.destroy()
+        
+        return list(file_paths)
+    
     def load_original_data(self, file_path=None):
         """
         オリジナルデータを読み込む
@@ -237,19 +427,28 @@ class PurchaseReportGenerator:
         print(f"オリジナルデータを読み込み中: {file_path}")
         
         try:
-            # ファイル拡張子に応じて読み込み方法を変更
-            if file_path.suffix.lower() == '.xls':
-                # .xlsファイルの場合
-                self.original_data = pd.read_excel(file_path, engine='xlrd')
-                # 列名の文字化けを修正
-                self.original_data.columns = self.original_data.columns.str.encode('latin1').str.decode('shift_jis', errors='ignore')
+            # ファイル拡張子に応じたエンジンでワークブックを開く
+            excel_file, self.reader_engine_used = self._open_workbook(file_path)
+            with excel_file:
+                # 見出し行だけを読み込み、レイアウトが変わったファイルは全行の読み込み・変換の前にエラーにする
+                header = excel_file.parse(0, nrows=0).columns
+                if self.reader_engine_used in MOJIBAKE_ENGINES:
+                    header = self._fix_mojibake_columns(header)
+                self.column_mapping = self.column_resolver.resolve(header, strict=self.strict_columns)
                 
-                # 文字列データの文字化けを修正
-                for col in self.original_data.select_dtypes(include=['object']).columns:
-                    self.original_data[col] = self.original_data[col].astype(str).str.encode('latin1').str.decode('shift_jis', errors='ignore')
-            else:
-                # .xlsxファイルの場合
-                self.original_data = pd.read_excel(file_path, engine='openpyxl')
+                self.original_data = excel_file.parse(0)
+            
+            if self.reader_engine_used in MOJIBAKE_ENGINES:
+                self.original_data = self._fix_mojibake(self.original_data)
+            
+            # 出力ファイルとの対応付け用に入力ファイルのハッシュを記録
+            self.source_hash = compute_file_hash(file_path)
+            
+            # 仕入先名・メーカー名の表記揺れを統一
+            self.original_data = self.name_normalizer.normalize(self.original_data)
+            
+            # 金額列を整数（円）に変換
+            self.original_data = self.convert_money_columns(self.original_data)
             
             print(f"データ読み込み完了: {len(self.original_data)}行")
             print(f"列名: {list(self.original_data.columns)}")
@@ -262,6 +461,244 @@ class PurchaseReportGenerator:
     
 
     
+    def convert_money_columns(self, data):
+        """
+        受入金額を整数（円）に、受入単価を丸めない数値に変換し、受入数量×受入単価と受入金額を検算
+        
+        Args:
+            data (pandas.DataFrame): 対象データ
+        
+        Returns:
+            pandas.DataFrame: 受入金額がint64、受入単価がfloat64に変換されたデータ
+        """
+        converted = normalize_money_columns(data)
+        
+        # 保持する値（変換後）で検算する
+        mismatches = find_line_total_mismatches(converted)
+        if mismatches.any():
+            print(f"  警告: 受入金額が受入数量×受入単価と一致しない明細が{int(mismatches.sum())}件あります")
+        
+        return converted
+    
+    def get_reader_engines(self, file_path):
+        """
+        ファイルの読み込みに使用するエンジンの候補を取得
+        
+        Args:
+            file_path (pathlib.Path): 読み込むファイルのパス
+        
+        Returns:
+            list: 試行するエンジン名のリスト（優先順）
+        """
+        suffix = file_path.suffix.lower()
+        default_engines = EXCEL_READER_ENGINES.get(suffix, EXCEL_READER_ENGINES['.xlsx'])
+        if self.reader_engine == 'auto':
+            engines = default_engines
+        else:
+            # 指定エンジンで読めない場合は従来のエンジンにフォールバック
+            engines = [self.reader_engine] + [engine for engine in default_engines if engine != self.reader_engine]
+        # 同じ形式で一度失敗したエンジンは除外する（最後の候補は常に残す）
+        return [engine for engine in engines[:-1] if (engine, suffix) not in self.failed_engines] + engines[-1:]
+    
+    def read_excel_file(self, file_path, **kwargs):
+        """
+        候補エンジンを順に試してExcelファイルを読み込む
+        
+        Args:
+            file_path (pathlib.Path): 読み込むファイルのパス
+            **kwargs: pandas.read_excelに渡す追加引数（nrows、usecolsなど）
+        
+        Returns:
+            tuple: (読み込んだDataFrame, 使用したエンジン名)
+        """
+        return self._read_with_engines(Path(file_path), lambda engine: pd.read_excel(file_path, engine=engine, **kwargs))
+    
+    def _read_with_engines(self, file_path, reader):
+        """
+        候補エンジンを順に試して読み込み関数を実行する
+        
+        エンジン未インストールの場合と、後の候補で同じファイルを読み込めた場合（形式に非対応）は、
+        そのエンジンを同じ拡張子のファイルでは以降試行しない。ファイル自体の破損で全候補が失敗した場合は記録しない
+        
+        Args:
+            file_path (pathlib.Path): 読み込むファイルのパス
+            reader (callable): エンジン名を受け取って読み込み結果を返す関数
+        
+        Returns:
+            tuple: (読み込み結果, 使用したエンジン名)
+        """
+        suffix = file_path.suffix.lower()
+        engines = self.get_reader_engines(file_path)
+        failed = []
+        last_error = None
+        for position, engine in enumerate(engines):
+            try:
+                result = reader(engine)
+            except Exception as e:
+                print(f"  エンジン {engine} で読み込めませんでした: {e}")
+                # 最後の候補は常に試行するため記録しない
+                if isinstance(e, ImportError) and position < len(engines) - 1:
+                    self._disable_engine(engine, suffix)
+                failed.append(engine)
+                last_error = e
+                continue
+            
+            for failed_engine in failed:
+                self._disable_engine(failed_engine, suffix)
+            print(f"読み込みエンジン: {engine}")
+            return result, engine
+        raise last_error
+    
+    def _disable_engine(self, engine, suffix):
+        """同じ拡張子のファイルでエンジンを以降試行しないよう記録する"""
+        if (engine, suffix) not in self.failed_engines:
+            self.failed_engines.add((engine, suffix))
+            print(f"  エンジン {engine} は以降の{suffix}ファイルでは使用しません")
+    
+    def _fix_mojibake_columns(self, columns):
+        """
+        列名の文字化けを修正（見出し行だけでレイアウトを確認する場合にも使用）
+        
+        Args:
+            columns (pandas.Index): 列名
+        
+        Returns:
+            pandas.Index: 文字化けを修正した列名
+        """
+        return columns.str.encode('latin1').str.decode('shift_jis', errors='ignore')
+    
+    def _fix_mojibake(self, data):
+        """
+        xlrdで読み込んだ.xlsファイルの文字化け（latin1として解釈されたshift_jis）を修正
+        
+        Args:
+            data (pandas.DataFrame): 対象データ
+        
+        Returns:
+            pandas.DataFrame: 文字化けを修正したデータ
+        """
+        # 列名の文字化けを修正
+        data.columns = self._fix_mojibake_columns(data.columns)
+        
+        # 文字列データの文字化けを修正
+        for col in data.select_dtypes(include=['object']).columns:
+            data[col] = data[col].astype(str).str.encode('latin1').str.decode('shift_jis', errors='ignore')
+        
+        return data
+    
+    def consolidate_data(self, file_paths, action='drop'):
+        """
+        複数のオリジナルデータを読み込み、重複行を除外して結合する
+        
+        ファイルごとに重複除外を行うため、先に読み込んだデータを再走査せずに
+        期間が重なるエクスポートを統合できる
+        
+        Args:
+            file_paths (list): 読み込むファイルのパスのリスト
+            action (str): 'drop'（重複行を除外）または 'flag'（重複フラグを付与）
+        
+        Returns:
+            pandas.DataFrame: 結合したデータ
+        """
+        frames = []
+        source_hashes = []
+        for file_path in file_paths:
+            data = self.load_original_data(file_path)
+            source_hashes.append(self.source_hash)
+            frames.append(self.deduplicate_data(data, action=action))
+        
+        # 複数ファイルの場合は各ファイルのハッシュを連結して1つのハッシュにする
+        if len(source_hashes) > 1:
+            self.source_hash = hashlib.sha256(''.join(source_hashes).encode('ascii')).hexdigest()
+        
+        self.original_data = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        print(f"データ統合完了: {len(file_paths)}ファイル, {len(self.original_data)}行")
+        
+        return self.original_data
+    
+    def _compute_dedup_fingerprints(self, data):
+        """
+        重複判定用のフィンガープリントを計算する
+        
+        同じキーを持つ行が同一ファイル内に複数ある場合は出現番号で区別するため、
+        1つのエクスポート内の正当な同一明細は重複として扱われない
+        
+        Args:
+            data (pandas.DataFrame): 対象データ
+        
+        Returns:
+            numpy.ndarray: 行ごとのフィンガープリント（uint64）
+        """
+        keys = pd.DataFrame({'key': compute_row_fingerprints(data, self.dedup_key_columns)})
+        keys['occurrence'] = keys.groupby('key').cumcount()
+        return pd.util.hash_pandas_object(keys, index=False).to_numpy(dtype='uint64')
+    
+    def _load_fingerprint_index(self):
+        """
+        保存済みのフィンガープリントインデックスを読み込む
+        
+        Returns:
+            numpy.ndarray: ソート済みのフィンガープリント（uint64）
+        """
+        if not self.fingerprint_index_path.exists():
+            return np.empty(0, dtype='uint64')
+        
+        fingerprints = np.load(self.fingerprint_index_path)
+        print(f"フィンガープリントインデックスを読み込みました: {len(fingerprints)}件")
+        return fingerprints.astype('uint64')
+    
+    def _save_fingerprint_index(self):
+        """フィンガープリントインデックスを保存する（一時ファイル経由で置き換え）"""
+        temp_path = self.fingerprint_index_path.with_name(f".{self.fingerprint_index_path.name}.tmp")
+        with open(temp_path, 'wb') as f:
+            np.save(f, self.seen_fingerprints)
+        os.replace(temp_path, self.fingerprint_index_path)
+    
+    def deduplicate_data(self, data, action='drop'):
+        """
+        取り込み済みの行と重複する行を除外またはフラグ付けする
+        
+        Args:
+            data (pandas.DataFrame): 対象データ（1エクスポート分）
+            action (str): 'drop'（重複行を除外）または 'flag'（重複フラグを付与）
+        
+        Returns:
+            pandas.DataFrame: 重複除外後のデータ
+        """
+        if action not in ('drop', 'flag'):
+            raise ValueError(f"未定義の重複処理です: {action}")
+        
+        print("重複行を判定中...")
+        fingerprints = self._compute_dedup_fingerprints(data)
+        
+        # 確定済み・今回取り込み済みのフィンガープリントに対する二分探索で判定（O(n log m)）
+        repeated = (_contains_sorted(self.seen_fingerprints, fingerprints)
+                    | _contains_sorted(self.pending_fingerprints, fingerprints))
+        
+        # インデックスへの保存は出力完了後に行う（途中で失敗した場合に再実行で行が失われないように）
+        self.pending_fingerprints = np.union1d(self.pending_fingerprints, fingerprints[~repeated])
+        
+        print(f"重複行: {int(repeated.sum())}行 / {len(data)}行")
+        
+        if action == 'drop':
+            return data[~repeated].copy()
+        
+        flagged = data.copy()
+        flagged[DUPLICATE_FLAG_COLUMN] = repeated
+        return flagged
+    
+    def commit_fingerprints(self):
+        """
+        今回取り込んだ行のフィンガープリントを確定する
+        
+        出力ファイルの書き込みが完了した後に呼び出す。use_fingerprint_index=Trueの場合はインデックスファイルに保存する
+        """
+        self.seen_fingerprints = np.union1d(self.seen_fingerprints, self.pending_fingerprints)
+        self.pending_fingerprints = np.empty(0, dtype='uint64')
+        if self.use_fingerprint_index:
+            self._save_fingerprint_index()
+            print(f"フィンガープリントインデックスを保存しました: {len(self.seen_fingerprints)}件")
+    
     def load_category_mapping(self, filename=None):
         """
         分類置換テーブルを読み込む（非推奨 - 内部定義を使用）
@@ -318,13 +755,60 @@ class PurchaseReportGenerator:
         
         return filtered_data
     
-    def export_data_to_json(self, data, filename=None):
+    def _exclude_duplicates(self, data):
+        """
+        重複フラグが付いた行を集計対象から除外する
+        
+        Args:
+            data (pandas.DataFrame): 対象データ
+        
+        Returns:
+            pandas.DataFrame: 重複フラグのない行
+        """
+        if DUPLICATE_FLAG_COLUMN in data.columns:
+            return data[~data[DUPLICATE_FLAG_COLUMN].astype(bool)]
+        return data
+    
+    def create_category_summary(self, data):
+        """
+        分類別の集計を作成
+        
+        Args:
+            data (pandas.DataFrame): 対象データ
+        
+        Returns:
+            pandas.DataFrame: 分類別集計データ
+        """
+        summary_data = self._exclude_duplicates(data)
+        # 分類コードは整数で出力（欠損値を含む列がfloatで集計されるのを防ぐ）
+        summary_data = summary_data.assign(**{'分類ｺｰﾄﾞ': pd.to_numeric(summary_data['分類ｺｰﾄﾞ'], errors='coerce').fillna(0).astype('int64')})
+        category_summary = aggregate_yen(summary_data, ['分類ｺｰﾄﾞ', '分類名称_置換後'])
+        category_summary.columns = ['分類コード', '分類名称（置換後）', '件数', '合計金額']
+        return category_summary
+    
+    def create_file_summary(self, data):
+        """
+        ファイル別の集計を作成
+        
+        Args:
+            data (pandas.DataFrame): 対象データ
+        
+        Returns:
+            pandas.DataFrame: ファイル別集計データ
+        """
+        file_summary = aggregate_yen(self._exclude_duplicates(data), 'ﾌｧｲﾙNO')
+        file_summary.columns = ['ファイルNO', '件数', '合計金額']
+        return file_summary
+    
+    def export_data_to_json(self, data, filename=None, approximate=False, chunk_size=100000):
         """
         データをJSONファイルに出力（分析用に最適化）
         
         Args:
             data (pandas.DataFrame): 出力するデータ
             filename (str, optional): 出力ファイル名。Noneの場合は自動生成
+            approximate (bool): Trueの場合、カテゴリ変数の情報と分位点を固定メモリのスケッチで近似計算する
+            chunk_size (int): 近似計算時のチャンク行数
         
         Returns:
             str: 出力されたファイルのパス
@@ -335,38 +819,50 @@ class PurchaseReportGenerator:
         
         file_path = self.output_dir / filename
         
+        # 重複フラグ付きの行は明細には残し、統計・合計からは除外する
+        unique_data = self._exclude_duplicates(data)
+        
         # データ型情報を取得
         dtype_info = {}
         for col in data.columns:
             dtype_info[col] = str(data[col].dtype)
         
         # 基本統計情報を計算
-        numeric_columns = data.select_dtypes(include=['number']).columns
+        numeric_columns = unique_data.select_dtypes(include=['number']).columns
         statistics = {}
         for col in numeric_columns:
             statistics[col] = {
-                'mean': float(data[col].mean()) if not data[col].isna().all() else None,
-                'std': float(data[col].std()) if not data[col].isna().all() else None,
-                'min': float(data[col].min()) if not data[col].isna().all() else None,
-                'max': float(data[col].max()) if not data[col].isna().all() else None,
-                'count': int(data[col].count())
+                'mean': float(unique_data[col].mean()) if not unique_data[col].isna().all() else None,
+                'std': float(unique_data[col].std()) if not unique_data[col].isna().all() else None,
+                'min': float(unique_data[col].min()) if not unique_data[col].isna().all() else None,
+                'max': float(unique_data[col].max()) if not unique_data[col].isna().all() else None,
+                'count': int(unique_data[col].count())
             }
         
         # カテゴリ変数の基本情報
-        categorical_columns = data.select_dtypes(include=['object']).columns
+        categorical_columns = unique_data.select_dtypes(include=['object']).columns
         categorical_info = {}
-        for col in categorical_columns:
-            value_counts = data[col].value_counts().head(10).to_dict()
-            categorical_info[col] = {
-                'unique_count': int(data[col].nunique()),
-                'top_values': {str(k): int(v) for k, v in value_counts.items()}
-            }
+        quantile_info = None
+        if approximate:
+            # 大量データ向け: チャンクごとにスケッチを更新し、全件のvalue_counts/nuniqueを避ける
+            profiler = DataProfiler(list(categorical_columns))
+            profiler.update_in_chunks(unique_data, chunk_size=chunk_size)
+            categorical_info = profiler.categorical_info()
+            quantile_info = profiler.quantile_info()
+        else:
+            for col in categorical_columns:
+                value_counts = unique_data[col].value_counts().head(10).to_dict()
+                categorical_info[col] = {
+                    'unique_count': int(unique_data[col].nunique()),
+                    'top_values': {str(k): int(v) for k, v in value_counts.items()}
+                }
         
         # DataFrameをJSON形式に変換
         json_data = {
             'metadata': {
                 'generated_at': datetime.now().isoformat(),
                 'total_records': len(data),
+                'duplicate_records': len(data) - len(unique_data),
                 'columns': list(data.columns),
                 'data_types': dtype_info,
                 'file_no': data['ﾌｧｲﾙNO'].iloc[0] if len(data) > 0 else None
@@ -377,10 +873,16 @@ class PurchaseReportGenerator:
             },
             'data': data.to_dict('records')
         }
+        if quantile_info is not None:
+            json_data['statistics']['quantiles'] = quantile_info
         
         # JSONファイルに出力
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(json_data, f, ensure_ascii=False, indent=2)
+        with atomic_output(file_path) as temp_path:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(json_data, f, ensure_ascii=False, indent=2)
+        
+        self.manifest.record(file_path, 'report_json', row_count=len(data), totals=build_totals(unique_data),
+                             source_hash=self.source_hash, details={'file_no': json_data['metadata']['file_no']})
         
         print(f"JSONファイルを出力しました: {file_path}")
         return str(file_path)
@@ -403,7 +905,11 @@ class PurchaseReportGenerator:
         file_path = self.output_dir / filename
         
         # CSVファイルに出力（UTF-8 BOM付きでExcel対応）
-        data.to_csv(file_path, index=False, encoding='utf-8-sig')
+        with atomic_output(file_path) as temp_path:
+            data.to_csv(temp_path, index=False, encoding='utf-8-sig')
+        
+        self.manifest.record(file_path, 'report_csv', row_count=len(data), totals=build_totals(self._exclude_duplicates(data)),
+                             source_hash=self.source_hash, details=build_csv_details(data))
         
         print(f"CSVファイルを出力しました: {file_path}")
         return str(file_path)
@@ -438,8 +944,13 @@ class PurchaseReportGenerator:
         }
         
         # JSONファイルに出力
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(summary_data, f, ensure_ascii=False, indent=2)
+        with atomic_output(file_path) as temp_path:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(summary_data, f, ensure_ascii=False, indent=2)
+        
+        self.manifest.record(file_path, 'summary_json', row_count=len(category_summary),
+                             totals={'合計金額': sum_yen(category_summary['合計金額'])}, source_hash=self.source_hash,
+                             details=build_summary_details(summary_data['category_summary'], summary_data['file_summary']))
         
         print(f"集計JSONファイルを出力しました: {file_path}")
         return str(file_path)
@@ -463,41 +974,132 @@ class PurchaseReportGenerator:
         
         file_path = self.output_dir / filename
         
+        # 重複フラグの列は出力しないため、重複フラグ付きの行は除外する
+        filtered_data = self._exclude_duplicates(filtered_data)
+        
         # 画像の列構成に合わせてデータを整形
         formatted_data = self._format_data_for_excel(filtered_data)
         
         # Excelファイルに出力
-        formatted_data.to_excel(file_path, index=False, sheet_name='20250825_オリジナルデータ')
+        with atomic_output(file_path) as temp_path:
+            formatted_data.to_excel(temp_path, index=False, sheet_name=EXCEL_SHEET_NAME)
+        
+        self.manifest.record(file_path, 'report_excel', row_count=len(formatted_data), totals=build_totals(filtered_data),
+                             source_hash=self.source_hash, details={'columns': list(formatted_data.columns)})
         
         print(f"Excelファイルを出力しました: {file_path}")
         return str(file_path)
     
-    def _find_column_by_keywords(self, df, keywords):
+    def export_partitioned(self, filtered_data, partition_by='file_no', max_workers=None):
         """
-        キーワードに基づいて列名を検索する
+        ファイルNOまたは分類ごとにExcelとJSONを分割出力する
+        
+        データの整形と分割は1回だけ行い、各パーティションの書き込みをプロセスプールで並列実行する
         
         Args:
-            df (pandas.DataFrame): 検索対象のDataFrame
-            keywords (list): 検索キーワードのリスト
+            filtered_data (pandas.DataFrame): フィルタリングされたデータ
+            partition_by (str): 分割単位（'file_no' または 'category'）
+            max_workers (int, optional): 並列プロセス数。Noneの場合はCPU数、1の場合は逐次実行
         
         Returns:
-            str: 見つかった列名、見つからない場合はNone
+            str: パーティション一覧（インデックスファイル）のパス
         """
-        # 完全一致を優先
-        for col in df.columns:
-            col_str = str(col)
-            for keyword in keywords:
-                if keyword == col_str:
-                    return col
+        if partition_by not in PARTITION_COLUMNS:
+            raise ValueError(f"未定義の分割単位です: {partition_by}（{', '.join(PARTITION_COLUMNS)}のいずれかを指定）")
+        
+        partition_column = PARTITION_COLUMNS[partition_by]
+        if partition_column not in filtered_data.columns:
+            raise ValueError(f"分割に使用する列が見つかりません: {partition_column}")
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        partition_dir = self.output_dir / f"partitions_{partition_by}_{timestamp}"
+        partition_dir.mkdir(exist_ok=True)
+        
+        # 重複フラグ付きの行はパーティションにも合計にも含めない
+        detail_data = self._exclude_duplicates(filtered_data).reset_index(drop=True)
+        formatted_data = self._format_data_for_excel(detail_data)
+        
+        # 1回のグループ化で各パーティションの行位置を取得
+        groups = detail_data.groupby(partition_column, sort=True, dropna=False).indices
+        print(f"パーティション出力中: {partition_column}で{len(groups)}件に分割")
+        
+        tasks = []
+        used_stems = set()
+        for key, positions in groups.items():
+            stem = _partition_file_stem(key)
+            # ファイル名に使えない文字の置換で名前が重なった場合は連番を付ける
+            base_stem, suffix = stem, 2
+            while stem in used_stems:
+                stem = f"{base_stem}_{suffix}"
+                suffix += 1
+            used_stems.add(stem)
+            
+            partition_detail = detail_data.iloc[positions]
+            metadata = {
+                'generated_at': datetime.now().isoformat(),
+                'partition_by': partition_by,
+                'partition_key': None if pd.isna(key) else str(key),
+                'total_records': len(partition_detail),
+                'source_hash': self.source_hash
+            }
+            tasks.append((stem, formatted_data.iloc[positions], partition_detail, metadata))
+        
+        if max_workers == 1:
+            results = [_write_partition(partition_dir, *task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(_write_partition, partition_dir, *task) for task in tasks]
+                results = [future.result() for future in futures]
+        
+        partitions = []
+        for (stem, _, partition_detail, metadata), paths in zip(tasks, results):
+            partitions.append({
+                'partition_key': metadata['partition_key'],
+                'row_count': metadata['total_records'],
+                'totals': build_totals(partition_detail),
+                'excel': str(Path(paths['excel']).relative_to(self.output_dir)),
+                'json': str(Path(paths['json']).relative_to(self.output_dir))
+            })
+        
+        # 分割単位を含めたディレクトリ名と対応させ、同じ秒の別単位の出力と重ならないようにする
+        index_path = self.output_dir / f"{partition_dir.name.replace('partitions_', 'partition_index_', 1)}.json"
+        index_data = {
+            'metadata': {
+                'generated_at': datetime.now().isoformat(),
+                'partition_by': partition_by,
+                'partition_column': partition_column,
+                'partition_count': len(partitions),
+                'total_records': len(detail_data),
+                'source_hash': self.source_hash
+            },
+            'partitions': partitions
+        }
+        with atomic_output(index_path) as temp_path:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(index_data, f, ensure_ascii=False, indent=2)
         
-        # 部分一致を試行
-        for col in df.columns:
-            col_lower = str(col).lower()
-            for keyword in keywords:
-                if keyword.lower() in col_lower:
-                    return col
+        self.manifest.record(index_path, 'partition_index', row_count=len(detail_data), totals=build_totals(detail_data),
+                             source_hash=self.source_hash,
+                             details={'partition_by': partition_by, 'partition_count': len(partitions),
+                                      'partition_dir': partition_dir.name})
         
-        return None
+        print(f"パーティション一覧を出力しました: {index_path}")
+        return str(index_path)
+    
+    def _get_column_mapping(self, data):
+        """
+        出力列の対応付けを取得する（読み込み時に決定した対応付けの列がすべてある場合はそれを再利用）
+        
+        Args:
+            data (pandas.DataFrame): 対象データ
+        
+        Returns:
+            dict: 出力列のタイトル -> 元データの列名（見つからない場合はNone）
+        """
+        if self.column_mapping is not None and all(
+                source_col is None or source_col in data.columns for source_col in self.column_mapping.values()):
+            return self.column_mapping
+        return self.column_resolver.resolve(data.columns, strict=self.strict_columns)
 
     def _format_data_for_excel(self, filtered_data):
         """
@@ -512,6 +1114,9 @@ class PurchaseReportGenerator:
         print("Excel出力形式にデータを整形中...")
         formatted_data = pd.DataFrame()
         
+        # 列の対応付けは読み込み時に決定したものを使用（欠けている列は下でデフォルト値を設定）
+        column_mapping = self._get_column_mapping(filtered_data)
+        
         # 各列の定義に基づいてデータを処理
         for col_def in EXCEL_OUTPUT_COLUMNS:
             column_title = col_def['title']
@@ -522,7 +1127,7 @@ class PurchaseReportGenerator:
             print(f"列 {col_def['column']} ({column_title}): {col_def['description']}")
             
             # ソース列を検索
-            source_col = self._find_column_by_keywords(filtered_data, source_keywords)
+            source_col = column_mapping[column_title]
             
             if source_col:
                 print(f"  ソース列: {source_col}")
@@ -550,7 +1155,7 @@ class PurchaseReportGenerator:
                             return 0
                     
                     # 分類コード列を検索（A列と同じソースを使用）
-                    category_code_col = self._find_column_by_keywords(filtered_data, ['分類', 'コード', '分類ｺｰﾄﾞ'])
+                    category_code_col = column_mapping['分類コード']
                     if category_code_col:
                         category_codes = filtered_data[category_code_col].apply(safe_int_convert_category).astype(str).str.zfill(2)
                         formatted_data[column_title] = category_codes.map(CATEGORY_MAPPING).fillna('')
@@ -574,10 +1179,10 @@ class PurchaseReportGenerator:
                     formatted_data[column_title] = filtered_data[source_col].apply(safe_int_convert)
                 
                 elif transformation == 'quantity_convert':
-                    formatted_data[column_title] = filtered_data[source_col].fillna(0).astype(int)
+                    formatted_data[column_title] = to_quantity(filtered_data[source_col]).to_numpy()
                 
                 elif transformation == 'price_convert':
-                    formatted_data[column_title] = filtered_data[source_col].fillna(0)
+                    formatted_data[column_title] = to_unit_price(filtered_data[source_col]).fillna(0).to_numpy()
                 
                 else:
                     print(f"  警告: 未定義の変換ロジック '{transformation}' を使用")
@@ -596,6 +1201,278 @@ class PurchaseReportGenerator:
         print(f"データ整形完了: {len(formatted_data)}行、{len(formatted_data.columns)}列")
         return formatted_data
     
+    def process_file(self, file_path):
+        """
+        1つのオリジナルデータからレポート一式を生成（ダイアログを使わないバッチ処理用）
+        
+        Args:
+            file_path (str): オリジナルデータファイルのパス
+        
+        Returns:
+            dict: 出力ファイルの種類 -> パス
+        """
+        file_path = Path(file_path)
+        original_data = self.load_original_data(file_path)
+        processed_data = self.apply_category_mapping(original_data)
+        filtered_data = self.filter_data(processed_data)
+        
+        category_summary = self.create_category_summary(filtered_data)
+        file_summary = self.create_file_summary(filtered_data)
+        
+        # 同じ秒に複数ファイルを処理しても重ならないよう、入力ファイル名を出力ファイル名に含める
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        stem = _partition_file_stem(file_path.stem)
+        return {
+            'json': self.export_data_to_json(filtered_data, filename=f"purchase_report_{stem}_{timestamp}.json"),
+            'summary': self.export_summary_to_json(category_summary, file_summary, filename=f"purchase_summary_{stem}_{timestamp}.json"),
+            'excel': self.export_to_excel_format(filtered_data, category_summary, file_summary, filename=f"purchase_report_{stem}_{timestamp}.xlsx")
+        }
+    
+    def _load_checkpoint(self, checkpoint_path):
+        """
+        チェックポイントを読み込む
+        
+        Args:
+            checkpoint_path (pathlib.Path): チェックポイントファイルのパス
+        
+        Returns:
+            dict: 入力ファイルのパス -> 処理状態
+        """
+        if not checkpoint_path.exists():
+            return {}
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('inputs', {})
+    
+    def _save_checkpoint(self, checkpoint_path, inputs):
+        """
+        チェックポイントを一時ファイル経由で保存する
+        
+        Args:
+            checkpoint_path (pathlib.Path): チェックポイントファイルのパス
+            inputs (dict): 入力ファイルのパス -> 処理状態
+        """
+        with atomic_output(checkpoint_path) as temp_path:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'updated_at': datetime.now().isoformat(), 'inputs': inputs}, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+    
+    def _is_completed(self, state, input_hash):
+        """
+        チェックポイント上で処理済み（入力が同じで出力がすべて存在する）か判定する
+        
+        Args:
+            state (dict): チェックポイントの処理状態
+            input_hash (str): 現在の入力ファイルのハッシュ
+        
+        Returns:
+            bool: 処理済みの場合True
+        """
+        return (state is not None and state.get('status') == 'completed'
+                and state.get('input_hash') == input_hash
+                and all(Path(path).exists() for path in state.get('outputs', {}).values()))
+    
+    def run_batch(self, file_paths, checkpoint_path=None):
+        """
+        複数のオリジナルデータをチェックポイント付きで一括処理する
+        
+        処理済みの入力はスキップし、失敗・未処理の入力だけを処理するため、途中で止まっても再実行で再開できる
+        
+        Args:
+            file_paths (list): オリジナルデータファイルのパスのリスト
+            checkpoint_path (str, optional): チェックポイントファイルのパス。Noneの場合は出力ディレクトリのBATCH_CHECKPOINT_FILENAME
+        
+        Returns:
+            dict: 'completed'、'skipped'、'failed'の入力ファイルのリスト
+        """
+        checkpoint_path = Path(checkpoint_path) if checkpoint_path else self.output_dir / BATCH_CHECKPOINT_FILENAME
+        inputs = self._load_checkpoint(checkpoint_path)
+        result = {'completed': [], 'skipped': [], 'failed': []}
+        
+        for index, file_path in enumerate(file_paths, start=1):
+            key = str(Path(file_path).resolve())
+            print(f"\n=== バッチ処理 {index}/{len(file_paths)}: {file_path} ===")
+            
+            try:
+                input_hash = compute_file_hash(file_path)
+            except OSError as e:
+                print(f"入力ファイルを読み込めません: {e}")
+                inputs[key] = {'status': 'failed', 'error': str(e), 'updated_at': datetime.now().isoformat()}
+                self._save_checkpoint(checkpoint_path, inputs)
+                result['failed'].append(str(file_path))
+                continue
+            
+            if self._is_completed(inputs.get(key), input_hash):
+                print("処理済みのためスキップします")
+                result['skipped'].append(str(file_path))
+                continue
+            
+            try:
+                outputs = self.process_file(file_path)
+                inputs[key] = {
+                    'status': 'completed',
+                    'input_hash': input_hash,
+                    'outputs': {kind: str(Path(path).resolve()) for kind, path in outputs.items()},
+                    'updated_at': datetime.now().isoformat()
+                }
+                result['completed'].append(str(file_path))
+            except Exception as e:
+                print(f"処理に失敗しました: {e}")
+                inputs[key] = {
+                    'status': 'failed',
+                    'input_hash': input_hash,
+                    'error': str(e),
+                    'updated_at': datetime.now().isoformat()
+                }
+                result['failed'].append(str(file_path))
+            
+            # 1ファイルごとにチェックポイントを保存
+            self._save_checkpoint(checkpoint_path, inputs)
+        
+        print(f"\nバッチ処理完了: 処理 {len(result['completed'])}件, スキップ {len(result['skipped'])}件, 失敗 {len(result['failed'])}件")
+        return result
+    
+    def _open_workbook(self, file_path):
+        """
+        候補エンジンを順に試してワークブックを1回だけ開く（見出し行の確認と全行の読み込み、プレビューの各読み込みで再利用する）
+        
+        Args:
+            file_path (pathlib.Path): 対象ファイルのパス
+        
+        Returns:
+            tuple: (pandas.ExcelFile, 使用したエンジン名)
+        """
+        return self._read_with_engines(file_path, lambda engine: pd.ExcelFile(file_path, engine=engine))
+    
+    def _count_data_rows(self, excel_file, engine):
+        """
+        開いたワークブックからデータ行数（見出し行を除く）を取得
+        
+        Args:
+            excel_file (pandas.ExcelFile): 開いたワークブック
+            engine (str): 使用したエンジン名
+        
+        Returns:
+            int: データ行数、取得できない場合はNone
+        """
+        try:
+            if engine == 'xlrd':
+                return excel_file.book.sheet_by_index(0).nrows - 1
+            if engine == 'openpyxl':
+                max_row = excel_file.book.worksheets[0].max_row
+                return max_row - 1 if max_row else None
+            if engine == 'calamine':
+                # endは最後のセルの位置（0始まり）のため、行番号がそのまま見出し行を除いた行数になる
+                end = excel_file.book.get_sheet_by_index(0).end
+                return end[0] if end else 0
+        except Exception as e:
+            print(f"  行数を取得できませんでした: {e}")
+        return None
+    
+    def _read_preview_rows(self, excel_file, engine, n_rows, sample):
+        """
+        プレビュー用に一部の行だけを読み込む
+        
+        Args:
+            excel_file (pandas.ExcelFile): 開いたワークブック
+            engine (str): 使用したエンジン名
+            n_rows (int): 読み込む行数
+            sample (str): 'head'（先頭n_rows行）または 'stratified'（分類コードごとに均等に抽出）
+        
+        Returns:
+            tuple: (プレビューデータ, 分類コード列全体（stratifiedの場合のみ、それ以外はNone）)
+        """
+        head = excel_file.parse(0, nrows=n_rows)
+        if engine in MOJIBAKE_ENGINES:
+            head = self._fix_mojibake(head)
+        if sample == 'head':
+            return head, None
+        
+        # 分類コード列だけを全行読み込み、分類ごとに均等に行を選ぶ
+        code_col = self.column_resolver.resolve(head.columns, strict=False)['分類コード']
+        if code_col is None:
+            print("  警告: 分類コード列が見つからないため先頭行のみを使用します")
+            return head, None
+        
+        codes = excel_file.parse(0, usecols=[list(head.columns).index(code_col)]).iloc[:, 0]
+        per_category = max(1, math.ceil(n_rows / max(codes.nunique(), 1)))
+        sampled_positions = set(codes.groupby(codes.to_numpy(), dropna=False).head(per_category).index + 1)
+        
+        # 見出し行（0）と抽出した行だけを読み込む
+        sample_data = excel_file.parse(0, skiprows=lambda row: row != 0 and row not in sampled_positions)
+        if engine in MOJIBAKE_ENGINES:
+            sample_data = self._fix_mojibake(sample_data)
+        codes.name = code_col
+        return sample_data, codes
+    
+    def preview_original_data(self, file_path, n_rows=200, sample='head'):
+        """
+        オリジナルデータの一部だけを読み込み、列の対応付けと分類内訳の見込みを表示
+        
+        本処理の前に、正しいファイルかどうかを確認するために使用する。ワークブックは1回だけ開く。
+        .xlsx（calamine/openpyxl）では必要な行だけを読むため短時間で済むが、.xls（xlrd）は開く時点でシート全体を
+        解析するため、読み込み時間は通常の読み込みとほぼ同じになる
+        
+        Args:
+            file_path (str): 対象ファイルのパス
+            n_rows (int): 読み込む行数
+            sample (str): 'head'（先頭n_rows行）または 'stratified'（分類コードごとに均等に抽出）
+        
+        Returns:
+            dict: 'total_rows', 'column_mapping', 'category_projection' を含むプレビュー結果
+        """
+        if sample not in ('head', 'stratified'):
+            raise ValueError(f"未定義の抽出方法です: {sample}")
+        
+        started = time.perf_counter()
+        file_path = Path(file_path)
+        print(f"プレビュー中: {file_path}")
+        
+        # ワークブックは1回だけ開き、行数・先頭行・分類コード列・抽出行の読み込みで再利用する
+        excel_file, engine = self._open_workbook(file_path)
+        with excel_file:
+            total_rows = self._count_data_rows(excel_file, engine)
+            preview_data, all_codes = self._read_preview_rows(excel_file, engine, n_rows, sample)
+        
+        # 列の対応付け
+        column_mapping = self.column_resolver.resolve(preview_data.columns, strict=False)
+        
+        # 分類内訳の見込み（stratifiedは全行の分類コードから集計、headは先頭行の比率を全行数に拡大）
+        if all_codes is not None:
+            category_codes = pd.to_numeric(all_codes, errors='coerce').fillna(0).astype('int64').astype(str).str.zfill(2)
+            category_names = category_codes.map(CATEGORY_MAPPING)
+            category_projection = category_names.fillna('(未定義)').value_counts()
+        elif '分類ｺｰﾄﾞ' in preview_data.columns and '分類名称' in preview_data.columns:
+            category_names = self.apply_category_mapping(preview_data)['分類名称_置換後']
+            scale = (total_rows or len(preview_data)) / max(len(preview_data), 1)
+            category_projection = (category_names.value_counts() * scale).round().astype('int64')
+        else:
+            category_projection = pd.Series(dtype='int64')
+        
+        elapsed = time.perf_counter() - started
+        
+        print("\n=== プレビュー ===")
+        print(f"全体の行数: {total_rows if total_rows is not None else '不明'}")
+        print(f"読み込んだ行数: {len(preview_data)}（{'分類ごとに抽出' if all_codes is not None else '先頭行'}）")
+        print(f"列名: {list(preview_data.columns)}")
+        print("\n列の対応付け:")
+        for title, source_col in column_mapping.items():
+            print(f"  {title} <- {source_col if source_col else '(見つかりません)'}")
+        print("\n最初の5行:")
+        print(preview_data.head())
+        print("\n分類内訳の見込み（件数）:")
+        for category, count in category_projection.items():
+            print(f"  {category}: {count}件")
+        print(f"\nプレビュー所要時間: {elapsed:.2f}秒")
+        
+        return {
+            'total_rows': total_rows,
+            'preview_rows': len(preview_data),
+            'column_mapping': column_mapping,
+            'category_projection': {str(k): int(v) for k, v in category_projection.items()},
+            'elapsed_seconds': elapsed
+        }
+    
     def display_data_info(self):
         """データの基本情報を表示"""
         if self.original_data is None:
@@ -632,8 +1509,27 @@ class PurchaseReportGenerator:
         for logic_name, description in TRANSFORMATION_LOGIC.items():
             print(f"  {logic_name}: {description}")
 
-def main():
+def main(argv=None):
     """メイン関数"""
+    parser = argparse.ArgumentParser(description="仕入レポートを生成します（引数なしの場合はファイル選択ダイアログを表示）")
+    parser.add_argument('--batch', nargs='+', metavar='FILE', help="指定したオリジナルデータを一括処理する（中断後の再実行で再開）")
+    parser.add_argument('--checkpoint', help=f"バッチ処理のチェックポイントファイル（デフォルト: ReportOutput/{BATCH_CHECKPOINT_FILENAME}）")
+    parser.add_argument('--preview', metavar='FILE', help="指定したオリジナルデータの一部だけを読み込んで内容を確認する")
+    parser.add_argument('--preview-rows', type=int, default=200, help="プレビューで読み込む行数（デフォルト: 200）")
+    parser.add_argument('--stratified', action='store_true', help="プレビューで分類コードごとに均等に行を抽出する")
+    args = parser.parse_args(argv)
+    
+    if args.preview:
+        PurchaseReportGenerator().preview_original_data(args.preview, n_rows=args.preview_rows,
+                                                        sample='stratified' if args.stratified else 'head')
+        return
+    
+    if args.batch:
+        result = PurchaseReportGenerator().run_batch(args.batch, checkpoint_path=args.checkpoint)
+        if result['failed']:
+            raise SystemExit(1)
+        return
+    
     print("仕入レポート生成プログラムを開始します")
     print("ファイル選択ダイアログが表示されます。")
     
@@ -641,9 +1537,12 @@ def main():
     generator = PurchaseReportGenerator()
     
     try:
-        # オリジナルデータを読み込み
+        # オリジナルデータを読み込み（複数選択時は重複行を除外して統合）
         print("\n=== ステップ1: オリジナルデータの読み込み ===")
-        original_data = generator.load_original_data()
+        file_paths = generator.select_files_dialog(title="オリジナルデータファイルを選択してください")
+        if not file_paths:
+            raise ValueError("ファイルが選択されませんでした")
+        original_data = generator.consolidate_data(file_paths)
         
         # 分類置換テーブル情報を表示
         print("\n=== ステップ2: 分類置換テーブル情報 ===")
@@ -667,14 +1566,12 @@ def main():
         
         # 分類別の集計
         print("\n=== 分類別集計 ===")
-        category_summary = filtered_data.groupby(['分類ｺｰﾄﾞ', '分類名称_置換後'])['受入金額'].agg(['count', 'sum']).reset_index()
-        category_summary.columns = ['分類コード', '分類名称（置換後）', '件数', '合計金額']
+        category_summary = generator.create_category_summary(filtered_data)
         print(category_summary)
         
         # ファイル別の集計
         print("\n=== ファイル別集計 ===")
-        file_summary = filtered_data.groupby('ﾌｧｲﾙNO')['受入金額'].agg(['count', 'sum']).reset_index()
-        file_summary.columns = ['ファイルNO', '件数', '合計金額']
+        file_summary = generator.create_file_summary(filtered_data)
         print(file_summary)
         
         print("\n処理後のデータ（最初の10行）:")
@@ -692,6 +1589,9 @@ def main():
         # Excelファイルを出力（指定フォーマット）
         excel_file = generator.export_to_excel_format(filtered_data, category_summary, file_summary)
         
+        # 出力が完了したので取り込み済みの行を確定
+        generator.commit_fingerprints()
+        
         print("\n=== 処理完了 ===")
         print("オリジナルデータから分類置換テーブルの適用が完了しました。")
         print("データが以下のファイルに出力されました：")
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+差分レポート生成ユーティリティ
+同じジョブの前回・今回のオリジナルデータを比較し、追加・削除・変更された行だけを出力する
+"""
+
+import argparse
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+
+from purchase_report_generator import PurchaseReportGenerator, compute_row_fingerprints
+from output_manifest import atomic_output
+
+# 行を識別するキー列（ファイルNO, UNIT, 部品番号, 仕入先コード, 受入日）
+DIFF_KEY_COLUMNS = ['ﾌｧｲﾙNO', 'ﾕﾆｯﾄNO', '部品番号', '仕入先ｺｰﾄﾞ', '受入日']
+
+# 内容比較から除外する列（登録・更新の記録や支払状況など、仕入内容の変更ではない列）
+DIFF_IGNORE_COLUMNS = ['登録ID', '登録日時', '更新ID', '更新日時', '支払更新区分', '支払更新日', '状態']
+
+# 差分集計に使用する列
+DIFF_CATEGORY_COLUMN = '分類名称_置換後'
+DIFF_AMOUNT_COLUMN = '受入金額'
+
+class ReportDiffer:
+    """前回・今回エクスポートの差分抽出クラス"""
+
+    def __init__(self, output_dir="ReportOutput", key_columns=None, ignore_columns=None):
+        """
+        初期化
+
+        Args:
+            output_dir (str): 出力ディレクトリのパス
+            key_columns (list, optional): 行を識別するキー列。Noneの場合はDIFF_KEY_COLUMNS
+            ignore_columns (list, optional): 内容比較から除外する列。Noneの場合はDIFF_IGNORE_COLUMNS
+        """
+        self.output_dir = Path(output_dir)
+        self.key_columns = key_columns or DIFF_KEY_COLUMNS
+        self.ignore_columns = DIFF_IGNORE_COLUMNS if ignore_columns is None else ignore_columns
+        self.generator = PurchaseReportGenerator(output_dir)
+        self.previous_data = None
+        self.current_data = None
+
+        self.output_dir.mkdir(exist_ok=True)
+
+    def load_export(self, file_path):
+        """
+        エクスポートを読み込み、分類置換テーブルを適用する
+
+        Args:
+            file_path (str): オリジナルデータファイルのパス
+
+        Returns:
+            pandas.DataFrame: 分類名称が置換されたデータ
+        """
+        data = self.generator.load_original_data(file_path)
+        return self.generator.apply_category_mapping(data)
+
+    def _row_hashes(self, data, content_columns):
+        """
+        キー列の識別ハッシュと内容列の内容ハッシュを計算する
+
+        Args:
+            data (pandas.DataFrame): 対象データ
+            content_columns (list): 内容比較に使用する列
+
+        Returns:
+            pandas.DataFrame: '_identity', '_content', '_position' を持つDataFrame
+        """
+        return pd.DataFrame({
+            '_identity': compute_row_fingerprints(data, self.key_columns),
+            '_content': compute_row_fingerprints(data, content_columns),
+            '_position': np.arange(len(data))
+        })
+
+    def _match_rows(self, previous_hashes, current_hashes, columns):
+        """
+        指定列（＋同一値内の出現番号）で前回・今回の行を突き合わせる
+
+        Args:
+            previous_hashes (pandas.DataFrame): 前回データのハッシュ
+            current_hashes (pandas.DataFrame): 今回データのハッシュ
+            columns (list): 突き合わせに使用する列
+
+        Returns:
+            pandas.DataFrame: 突き合わせ結果（'_merge'列付き）
+        """
+        previous_hashes = previous_hashes.assign(_occurrence=previous_hashes.groupby(columns).cumcount())
+        current_hashes = current_hashes.assign(_occurrence=current_hashes.groupby(columns).cumcount())
+
+        return previous_hashes.merge(current_hashes, on=columns + ['_occurrence'], how='outer',
+                                     suffixes=('_prev', '_curr'), indicator=True)
+
+    def compare(self, previous_data, current_data):
+        """
+        前回・今回のデータを比較して追加・削除・変更行を抽出する
+
+        Args:
+            previous_data (pandas.DataFrame): 前回エクスポートのデータ
+            current_data (pandas.DataFrame): 今回エクスポートのデータ
+
+        Returns:
+            dict: 'added', 'removed', 'changed', 'category_delta' の各DataFrame
+        """
+        print("差分を抽出中...")
+        self.previous_data = previous_data.reset_index(drop=True)
+        self.current_data = current_data.reset_index(drop=True)
+
+        # 両方に存在する列だけで内容を比較（登録・更新の記録などの列は除外）
+        content_columns = [col for col in self.current_data.columns
+                           if col in self.previous_data.columns and col not in self.ignore_columns]
+
+        previous_hashes = self._row_hashes(self.previous_data, content_columns)
+        current_hashes = self._row_hashes(self.current_data, content_columns)
+
+        # 1段目: キーと内容が一致する行は変更なしとして除外
+        # （キーが重複する行も、内容が同じものから順に対応付ける）
+        exact = self._match_rows(previous_hashes, current_hashes, ['_identity', '_content'])
+        unmatched_previous = previous_hashes[previous_hashes['_position'].isin(exact.loc[exact['_merge'] == 'left_only', '_position_prev'])]
+        unmatched_current = current_hashes[current_hashes['_position'].isin(exact.loc[exact['_merge'] == 'right_only', '_position_curr'])]
+
+        # 2段目: 残りの行をキーだけで対応付け、対応した行を変更、残った行を追加・削除とする
+        merged = self._match_rows(unmatched_previous.drop(columns='_content'), unmatched_current.drop(columns='_content'), ['_identity'])
+
+        added_positions = merged.loc[merged['_merge'] == 'right_only', '_position_curr'].astype(int).to_numpy()
+        removed_positions = merged.loc[merged['_merge'] == 'left_only', '_position_prev'].astype(int).to_numpy()
+        both = merged[merged['_merge'] == 'both']
+        changed_prev_positions = both['_position_prev'].astype(int).to_numpy()
+        changed_curr_positions = both['_position_curr'].astype(int).to_numpy()
+
+        added = self.current_data.iloc[np.sort(added_positions)]
+        removed = self.previous_data.iloc[np.sort(removed_positions)]
+        changed = self._describe_changes(changed_prev_positions, changed_curr_positions, content_columns)
+
+        print(f"前回: {len(self.previous_data)}行, 今回: {len(self.current_data)}行")
+        print(f"追加: {len(added)}行, 削除: {len(removed)}行, 変更: {len(changed)}行")
+
+        return {
+            'added': added,
+            'removed': removed,
+            'changed': changed,
+            'category_delta': self._summarize_category_delta(added, removed, changed_prev_positions, changed_curr_positions)
+        }
+
+    def _describe_changes(self, previous_positions, current_positions, content_columns):
+        """
+        変更行について今回の値と変更された列名を整理する
+
+        Args:
+            previous_positions (numpy.ndarray): 前回データでの行位置
+            current_positions (numpy.ndarray): 今回データでの行位置
+            content_columns (list): 比較対象の列
+
+        Returns:
+            pandas.DataFrame: 今回の値に'変更列'と'変更前受入金額'を加えたデータ
+        """
+        previous_rows = self.previous_data.iloc[previous_positions][content_columns].reset_index(drop=True)
+        current_rows = self.current_data.iloc[current_positions].reset_index(drop=True)
+
+        # 変更行は少数なので、列ごとの比較はこの部分集合に対してだけ行う
+        differs = pd.DataFrame({
+            col: ~(previous_rows[col].astype(str).eq(current_rows[col].astype(str))
+                   | (previous_rows[col].isna() & current_rows[col].isna())).to_numpy()
+            for col in content_columns
+        })
+        changed = current_rows.copy()
+        changed['変更列'] = differs.apply(lambda row: ', '.join(row.index[row.to_numpy()]), axis=1) if len(differs) > 0 else []
+        if DIFF_AMOUNT_COLUMN in previous_rows.columns:
+            changed[f'変更前{DIFF_AMOUNT_COLUMN}'] = previous_rows[DIFF_AMOUNT_COLUMN].to_numpy()
+
+        return changed
+
+    def _summarize_category_delta(self, added, removed, previous_positions, current_positions):
+        """
+        分類別の差分（件数・金額）を集計する
+
+        Args:
+            added (pandas.DataFrame): 追加行
+            removed (pandas.DataFrame): 削除行
+            previous_positions (numpy.ndarray): 変更行の前回データでの行位置
+            current_positions (numpy.ndarray): 変更行の今回データでの行位置
+
+        Returns:
+            pandas.DataFrame: 分類別の追加・削除・変更件数と金額差分
+        """
+        if DIFF_CATEGORY_COLUMN not in self.current_data.columns or DIFF_AMOUNT_COLUMN not in self.current_data.columns:
+            return pd.DataFrame()
+
+        changed_previous = self.previous_data.iloc[previous_positions]
+        changed_current = self.current_data.iloc[current_positions]
+
+        # 変更行は今回の分類に金額差分を計上し、分類が変わった場合は前回の分類から前回金額を差し引く
+        frames = [
+            pd.DataFrame({'分類': added[DIFF_CATEGORY_COLUMN].to_numpy(), '追加件数': 1, '削除件数': 0, '変更件数': 0,
+                          '金額差分': added[DIFF_AMOUNT_COLUMN].to_numpy()}),
+            pd.DataFrame({'分類': removed[DIFF_CATEGORY_COLUMN].to_numpy(), '追加件数': 0, '削除件数': 1, '変更件数': 0,
+                          '金額差分': -removed[DIFF_AMOUNT_COLUMN].to_numpy()}),
+            pd.DataFrame({'分類': changed_current[DIFF_CATEGORY_COLUMN].to_numpy(), '追加件数': 0, '削除件数': 0, '変更件数': 1,
+                          '金額差分': changed_current[DIFF_AMOUNT_COLUMN].to_numpy()}),
+            pd.DataFrame({'分類': changed_previous[DIFF_CATEGORY_COLUMN].to_numpy(), '追加件数': 0, '削除件数': 0, '変更件数': 0,
+                          '金額差分': -changed_previous[DIFF_AMOUNT_COLUMN].to_numpy()})
+        ]
+        delta = pd.concat(frames, ignore_index=True).groupby('分類', sort=True)[['追加件数', '削除件数', '変更件数', '金額差分']].sum().reset_index()
+        delta.columns = ['分類名称（置換後）', '追加件数', '削除件数', '変更件数', '金額差分']
+
+        return delta
+
+    def export_diff(self, diff, filename=None):
+        """
+        差分をExcelとJSONに出力
+
+        Args:
+            diff (dict): compare()の戻り値
+            filename (str, optional): 出力ファイル名（拡張子なし）。Noneの場合は自動生成
+
+        Returns:
+            dict: 'excel'と'json'の出力ファイルパス
+        """
+        if filename is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"purchase_diff_{timestamp}"
+
+        excel_path = self.output_dir / f"{filename}.xlsx"
+        json_path = self.output_dir / f"{filename}.json"
+
+        with atomic_output(excel_path) as temp_path:
+            with pd.ExcelWriter(temp_path) as writer:
+                diff['category_delta'].to_excel(writer, index=False, sheet_name='分類別差分')
+                diff['added'].to_excel(writer, index=False, sheet_name='追加')
+                diff['removed'].to_excel(writer, index=False, sheet_name='削除')
+                diff['changed'].to_excel(writer, index=False, sheet_name='変更')
+
+        diff_data = {
+            'metadata': {
+                'generated_at': datetime.now().isoformat(),
+                'key_columns': self.key_columns,
+                'ignore_columns': self.ignore_columns,
+                'previous_records': len(self.previous_data),
+                'current_records': len(self.current_data),
+                'added_count': len(diff['added']),
+                'removed_count': len(diff['removed']),
+                'changed_count': len(diff['changed'])
+            },
+            'category_delta': diff['category_delta'].to_dict('records'),
+            'added': json.loads(diff['added'].to_json(orient='records', force_ascii=False)),
+            'removed': json.loads(diff['removed'].to_json(orient='records', force_ascii=False)),
+            'changed': json.loads(diff['changed'].to_json(orient='records', force_ascii=False))
+        }
+
+        with atomic_output(json_path) as temp_path:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(diff_data, f, ensure_ascii=False, indent=2, default=str)
+
+        counts = {key: diff_data['metadata'][key] for key in ('added_count', 'removed_count', 'changed_count')}
+        totals = {'金額差分': int(diff['category_delta']['金額差分'].sum())} if len(diff['category_delta']) > 0 else {}
+        for path, kind in ((excel_path, 'diff_excel'), (json_path, 'diff_json')):
+            self.generator.manifest.record(path, kind, row_count=sum(counts.values()), totals=totals,
+                                           source_hash=self.generator.source_hash, details=counts)
+
+        print(f"差分Excelファイルを出力しました: {excel_path}")
+        print(f"差分JSONファイルを出力しました: {json_path}")
+        return {'excel': str(excel_path), 'json': str(json_path)}
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="前回・今回のオリジナルデータの差分レポートを生成します")
+    parser.add_argument('previous', nargs='?', help="前回のオリジナルデータファイル（省略時はダイアログで選択）")
+    parser.add_argument('current', nargs='?', help="今回のオリジナルデータファイル（省略時はダイアログで選択）")
+    args = parser.parse_args()
+
+    differ = ReportDiffer()
+
+    previous_path = args.previous or differ.generator.select_file_dialog(title="前回のオリジナルデータファイルを選択してください")
+    current_path = args.current or differ.generator.select_file_dialog(title="今回のオリジナルデータファイルを選択してください")
+    if previous_path is None or current_path is None:
+        print("ファイルが選択されませんでした")
+        return
+
+    print("\n=== 前回データの読み込み ===")
+    previous_data = differ.load_export(previous_path)
+
+    print("\n=== 今回データの読み込み ===")
+    current_data = differ.load_export(current_path)
+
+    print("\n=== 差分抽出 ===")
+    diff = differ.compare(previous_data, current_data)
+
+    print("\n=== 分類別差分 ===")
+    print(diff['category_delta'])
+
+    differ.export_diff(diff)
+
+if __name__ == "__main__":
+    main()
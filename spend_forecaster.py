@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+仕入金額予測ユーティリティ
+仕入先別・分類別の月次金額からトレンド＋季節性モデルで将来の仕入金額を予測する
+"""
+
+import numpy as np
+import pandas as pd
+
+class SpendForecaster:
+    """仕入金額予測クラス（全系列を1回の最小二乗法でまとめて当てはめる）"""
+
+    def __init__(self, season_length=12, max_harmonics=3):
+        """
+        初期化
+
+        Args:
+            season_length (int): 季節周期（月数）
+            max_harmonics (int): 季節性を表すフーリエ項の最大次数
+        """
+        self.season_length = season_length
+        self.max_harmonics = max_harmonics
+        self.groups = None
+        self.months = None
+        self.matrix = None
+        self.coefficients = None
+        self.residual_std = None
+        self.harmonics = 0
+
+    def build_matrix(self, data, group_column, date_column='受入日', amount_column='受入金額'):
+        """
+        系列×月の密な金額行列を作成する
+
+        Args:
+            data (pandas.DataFrame): 明細データ
+            group_column (str): 系列の単位となる列（仕入先略称、分類名称_置換後など）
+            date_column (str): 日付列
+            amount_column (str): 金額列
+
+        Returns:
+            numpy.ndarray: 系列数×月数の金額行列
+        """
+        dates = pd.to_datetime(data[date_column], errors='coerce')
+        amounts = pd.to_numeric(data[amount_column], errors='coerce')
+        valid = dates.notna() & amounts.notna() & data[group_column].notna()
+
+        dates = dates[valid]
+        month_numbers = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy()
+        first_month = int(month_numbers.min()) if len(month_numbers) > 0 else 0
+        month_count = int(month_numbers.max()) - first_month + 1 if len(month_numbers) > 0 else 0
+
+        group_codes, self.groups = pd.factorize(data.loc[valid, group_column], sort=True)
+        self.months = pd.period_range(
+            start=pd.Period(year=first_month // 12, month=first_month % 12 + 1, freq='M'),
+            periods=month_count, freq='M'
+        )
+
+        # 系列コードと月番号を1次元の位置にまとめ、bincountで一括集計
+        flat_positions = group_codes * month_count + (month_numbers - first_month)
+        self.matrix = np.bincount(
+            flat_positions, weights=amounts[valid].to_numpy(dtype='float64'),
+            minlength=len(self.groups) * month_count
+        ).reshape(len(self.groups), month_count)
+
+        print(f"予測用行列を作成: {len(self.groups)}系列 × {month_count}か月")
+        return self.matrix
+
+    def _design_matrix(self, month_numbers):
+        """
+        定数項・トレンド・季節性（フーリエ項）からなる説明変数行列を作成する
+
+        Args:
+            month_numbers (numpy.ndarray): 先頭月を0とする月番号
+
+        Returns:
+            numpy.ndarray: 月数×説明変数数の行列
+        """
+        # 暦月に合わせた位相（1月=0）
+        calendar_months = month_numbers + (self.months[0].month - 1)
+        columns = [np.ones(len(month_numbers)), month_numbers.astype('float64')]
+        for k in range(1, self.harmonics + 1):
+            angle = 2 * np.pi * k * calendar_months / self.season_length
+            columns.append(np.sin(angle))
+            columns.append(np.cos(angle))
+        return np.column_stack(columns)
+
+    def fit(self, matrix=None):
+        """
+        全系列にトレンド＋季節性モデルを当てはめる
+
+        Args:
+            matrix (numpy.ndarray, optional): 系列数×月数の金額行列。Noneの場合はbuild_matrixの結果
+
+        Returns:
+            numpy.ndarray: 系列ごとの回帰係数（系列数×説明変数数）
+        """
+        if matrix is not None:
+            self.matrix = matrix
+        if self.matrix is None:
+            raise ValueError("予測用行列が作成されていません")
+
+        month_count = self.matrix.shape[1]
+
+        # 季節性は1周期以上のデータがある場合のみ、データ量に応じて次数を決める
+        if month_count >= 2 * self.season_length:
+            self.harmonics = self.max_harmonics
+        elif month_count >= self.season_length:
+            self.harmonics = 1
+        else:
+            self.harmonics = 0
+
+        design = self._design_matrix(np.arange(month_count))
+
+        # 全系列で説明変数行列が共通なので、1回のlstsqで全系列の係数を求める
+        coefficients, _, _, _ = np.linalg.lstsq(design, self.matrix.T, rcond=None)
+        self.coefficients = coefficients.T
+
+        residuals = self.matrix - self.coefficients @ design.T
+        degrees_of_freedom = max(month_count - design.shape[1], 1)
+        self.residual_std = np.sqrt((residuals ** 2).sum(axis=1) / degrees_of_freedom)
+
+        print(f"モデル当てはめ完了: {len(self.coefficients)}系列, 季節性次数 {self.harmonics}")
+        return self.coefficients
+
+    def predict(self, horizon=6):
+        """
+        将来の月次金額を予測する
+
+        Args:
+            horizon (int): 予測する月数
+
+        Returns:
+            pandas.DataFrame: 系列・予測月・予測金額（0円未満は0に切り上げ）・残差標準偏差
+        """
+        if self.coefficients is None:
+            raise ValueError("モデルが当てはめられていません")
+
+        month_count = self.matrix.shape[1]
+        future_design = self._design_matrix(np.arange(month_count, month_count + horizon))
+        predictions = np.clip(self.coefficients @ future_design.T, 0, None)
+
+        future_months = pd.period_range(start=self.months[-1] + 1, periods=horizon, freq='M')
+
+        return pd.DataFrame({
+            '系列': np.repeat(np.asarray(self.groups), horizon),
+            '予測月': np.tile(future_months.strftime('%Y-%m'), len(self.groups)),
+            '予測金額': np.rint(predictions.ravel()).astype('int64'),
+            '残差標準偏差': np.repeat(np.rint(self.residual_std), horizon).astype('int64')
+        })
+
+    def forecast(self, data, group_column, horizon=6, date_column='受入日', amount_column='受入金額'):
+        """
+        行列の作成・当てはめ・予測をまとめて実行する
+
+        Args:
+            data (pandas.DataFrame): 明細データ
+            group_column (str): 系列の単位となる列
+            horizon (int): 予測する月数
+            date_column (str): 日付列
+            amount_column (str): 金額列
+
+        Returns:
+            pandas.DataFrame: 予測結果（'系列'列はgroup_columnの名前に置き換え）
+        """
+        self.build_matrix(data, group_column, date_column, amount_column)
+        if self.matrix.size == 0:
+            return pd.DataFrame(columns=[group_column, '予測月', '予測金額', '残差標準偏差'])
+
+        self.fit()
+        return self.predict(horizon).rename(columns={'系列': group_column})
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+近似ストリーミング統計ユーティリティ
+大量データの列情報（上位値・ユニーク数・分位点）を固定メモリのスケッチで近似計算する
+スケッチはチャンク単位で更新でき、ファイル間・ワーカー間でマージできる
+"""
+
+import numpy as np
+import pandas as pd
+
+# 分位点スケッチを作成する列
+QUANTILE_COLUMNS = ['受入単価', '受入金額']
+
+# 出力する分位点
+DEFAULT_QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+class HeavyHitters:
+    """上位値スケッチ（Misra-Gries、最大capacity個のカウンタを保持）"""
+
+    def __init__(self, capacity=256):
+        """
+        初期化
+
+        Args:
+            capacity (int): 保持するカウンタ数（推定誤差は総数/(capacity+1)以下）
+        """
+        self.capacity = capacity
+        self.counters = pd.Series(dtype='float64')
+        self.total = 0.0
+
+    def update(self, values, weights=None):
+        """
+        チャンクの値でスケッチを更新する
+
+        Args:
+            values (pandas.Series): 値
+            weights (pandas.Series, optional): 重み（金額など）。Noneの場合は件数
+        """
+        values = pd.Series(values).reset_index(drop=True)
+        if weights is None:
+            chunk_counts = values.value_counts(dropna=True).astype('float64')
+        else:
+            weights = pd.Series(weights).reset_index(drop=True).astype('float64')
+            chunk_counts = weights.groupby(values, dropna=True).sum()
+
+        self.total += float(chunk_counts.sum())
+        self._combine(chunk_counts)
+
+    def merge(self, other):
+        """
+        別のスケッチをマージする
+
+        Args:
+            other (HeavyHitters): マージするスケッチ
+        """
+        self.total += other.total
+        self._combine(other.counters)
+
+    def _combine(self, counts):
+        """カウンタを加算し、capacityを超えた分は(capacity+1)番目の値を全体から差し引いて削る"""
+        combined = self.counters.add(counts, fill_value=0) if len(self.counters) > 0 else counts.copy()
+        if len(combined) > self.capacity:
+            combined = combined.sort_values(ascending=False)
+            threshold = combined.iloc[self.capacity]
+            combined = combined.iloc[:self.capacity] - threshold
+            combined = combined[combined > 0]
+        self.counters = combined
+
+    def top(self, n=10):
+        """
+        推定上位値を取得する
+
+        Args:
+            n (int): 取得件数
+
+        Returns:
+            pandas.Series: 値 -> 推定カウント（下限値）
+        """
+        return self.counters.sort_values(ascending=False).head(n)
+
+class HyperLogLog:
+    """ユニーク数スケッチ（HyperLogLog、2^precision個のレジスタを保持）"""
+
+    def __init__(self, precision=12):
+        """
+        初期化
+
+        Args:
+            precision (int): レジスタ数の指数（11〜16、標準誤差はおよそ1.04/sqrt(2^precision)）
+        """
+        if not 11 <= precision <= 16:
+            raise ValueError("precisionは11〜16の範囲で指定してください")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype='uint8')
+
+    def update(self, values):
+        """
+        チャンクの値でスケッチを更新する
+
+        Args:
+            values (pandas.Series): 値（欠損値は無視）
+        """
+        values = pd.Series(values).dropna()
+        if len(values) == 0:
+            return
+
+        hashes = pd.util.hash_array(values.astype(str).to_numpy(dtype=object))
+        remaining_bits = 64 - self.precision
+        buckets = (hashes >> np.uint64(remaining_bits)).astype('int64')
+
+        # 残りのビット列（53ビット以下なのでfloat64で正確に表せる）の先頭ゼロ数からランクを求める
+        remainder = (hashes & np.uint64((1 << remaining_bits) - 1)).astype('float64')
+        _, exponents = np.frexp(remainder)
+        ranks = np.where(remainder > 0, remaining_bits - exponents + 1, remaining_bits + 1).astype('uint8')
+
+        np.maximum.at(self.registers, buckets, ranks)
+
+    def merge(self, other):
+        """
+        別のスケッチをマージする
+
+        Args:
+            other (HyperLogLog): マージするスケッチ（precisionが同じもの）
+        """
+        if other.precision != self.precision:
+            raise ValueError("precisionが異なるHyperLogLogはマージできません")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        """
+        推定ユニーク数を取得する
+
+        Returns:
+            int: 推定ユニーク数
+        """
+        register_count = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / register_count)
+        estimate = alpha * register_count ** 2 / np.sum(np.ldexp(1.0, -self.registers.astype('int64')))
+
+        # 小さい値は線形カウンティングで補正
+        empty_registers = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * register_count and empty_registers > 0:
+            estimate = register_count * np.log(register_count / empty_registers)
+
+        return int(round(estimate))
+
+class QuantileSketch:
+    """分位点スケッチ（対数バケット、相対誤差relative_accuracy以内）"""
+
+    def __init__(self, relative_accuracy=0.01):
+        """
+        初期化
+
+        Args:
+            relative_accuracy (float): 分位点の相対誤差
+        """
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+        self.positive = pd.Series(dtype='int64')
+        self.negative = pd.Series(dtype='int64')
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def _bucket_counts(self, magnitudes):
+        """正の値を対数バケットに振り分けて件数を数える"""
+        keys = np.ceil(np.log(magnitudes) / self.log_gamma).astype('int64')
+        return pd.Series(keys).value_counts()
+
+    def update(self, values):
+        """
+        チャンクの値でスケッチを更新する
+
+        Args:
+            values (pandas.Series): 数値（欠損値は無視）
+        """
+        values = pd.to_numeric(pd.Series(values), errors='coerce').dropna().to_numpy(dtype='float64')
+        if len(values) == 0:
+            return
+
+        self.positive = self.positive.add(self._bucket_counts(values[values > 0]), fill_value=0).astype('int64')
+        self.negative = self.negative.add(self._bucket_counts(-values[values < 0]), fill_value=0).astype('int64')
+        self.zero_count += int(np.count_nonzero(values == 0))
+        self._update_moments(len(values), float(values.sum()), float(values.min()), float(values.max()))
+
+    def _update_moments(self, count, total, minimum, maximum):
+        """件数・合計・最小値・最大値を更新する"""
+        self.count += count
+        self.total += total
+        self.minimum = minimum if self.minimum is None else min(self.minimum, minimum)
+        self.maximum = maximum if self.maximum is None else max(self.maximum, maximum)
+
+    def merge(self, other):
+        """
+        別のスケッチをマージする
+
+        Args:
+            other (QuantileSketch): マージするスケッチ（relative_accuracyが同じもの）
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("relative_accuracyが異なるQuantileSketchはマージできません")
+        if other.count == 0:
+            return
+        self.positive = self.positive.add(other.positive, fill_value=0).astype('int64')
+        self.negative = self.negative.add(other.negative, fill_value=0).astype('int64')
+        self.zero_count += other.zero_count
+        self._update_moments(other.count, other.total, other.minimum, other.maximum)
+
+    def quantiles(self, qs=None):
+        """
+        推定分位点を取得する
+
+        Args:
+            qs (list, optional): 分位（0〜1）のリスト。Noneの場合はDEFAULT_QUANTILES
+
+        Returns:
+            dict: 分位 -> 推定値
+        """
+        qs = qs or DEFAULT_QUANTILES
+        if self.count == 0:
+            return {str(q): None for q in qs}
+
+        # 小さい順（負の大きい値 -> 0 -> 正の大きい値）にバケットを並べる
+        negative = self.negative.sort_index(ascending=False)
+        positive = self.positive.sort_index()
+        representatives = np.concatenate([
+            -2 * self.gamma ** negative.index.to_numpy(dtype='float64') / (self.gamma + 1),
+            [0.0],
+            2 * self.gamma ** positive.index.to_numpy(dtype='float64') / (self.gamma + 1)
+        ])
+        cumulative = np.cumsum(np.concatenate([negative.to_numpy(), [self.zero_count], positive.to_numpy()]))
+
+        result = {}
+        for q in qs:
+            rank = q * (self.count - 1)
+            position = int(np.searchsorted(cumulative, rank, side='right'))
+            value = representatives[min(position, len(representatives) - 1)]
+            result[str(q)] = float(np.clip(value, self.minimum, self.maximum))
+        return result
+
+class DataProfiler:
+    """列ごとのスケッチをまとめて管理するクラス"""
+
+    def __init__(self, categorical_columns, quantile_columns=None, capacity=256, precision=12, relative_accuracy=0.01):
+        """
+        初期化
+
+        Args:
+            categorical_columns (list): 上位値・ユニーク数を計算する列
+            quantile_columns (list, optional): 分位点を計算する列。Noneの場合はQUANTILE_COLUMNS
+            capacity (int): HeavyHittersのカウンタ数
+            precision (int): HyperLogLogの精度
+            relative_accuracy (float): QuantileSketchの相対誤差
+        """
+        self.heavy_hitters = {col: HeavyHitters(capacity) for col in categorical_columns}
+        self.cardinalities = {col: HyperLogLog(precision) for col in categorical_columns}
+        self.quantile_sketches = {
+            col: QuantileSketch(relative_accuracy)
+            for col in (QUANTILE_COLUMNS if quantile_columns is None else quantile_columns)
+        }
+        self.row_count = 0
+
+    def update(self, chunk):
+        """
+        チャンクでスケッチを更新する
+
+        Args:
+            chunk (pandas.DataFrame): データのチャンク
+        """
+        self.row_count += len(chunk)
+        for col, sketch in self.heavy_hitters.items():
+            if col in chunk.columns:
+                sketch.update(chunk[col])
+                self.cardinalities[col].update(chunk[col])
+        for col, sketch in self.quantile_sketches.items():
+            if col in chunk.columns:
+                sketch.update(chunk[col])
+
+    def update_in_chunks(self, data, chunk_size=100000):
+        """
+        DataFrameをチャンクに分けてスケッチを更新する
+
+        Args:
+            data (pandas.DataFrame): 対象データ
+            chunk_size (int): チャンクの行数
+        """
+        for start in range(0, len(data), chunk_size):
+            self.update(data.iloc[start:start + chunk_size])
+
+    def merge(self, other):
+        """
+        別のプロファイラをマージする（ファイル間・ワーカー間の集約用）
+
+        Args:
+            other (DataProfiler): マージするプロファイラ
+        """
+        self.row_count += other.row_count
+        for col, sketch in other.heavy_hitters.items():
+            if col in self.heavy_hitters:
+                self.heavy_hitters[col].merge(sketch)
+                self.cardinalities[col].merge(other.cardinalities[col])
+        for col, sketch in other.quantile_sketches.items():
+            if col in self.quantile_sketches:
+                self.quantile_sketches[col].merge(sketch)
+
+    def categorical_info(self, top_n=10):
+        """
+        カテゴリ変数の情報を取得する（export_data_to_jsonのcategorical_columnsと同じ形式）
+
+        Args:
+            top_n (int): 上位値の件数
+
+        Returns:
+            dict: 列名 -> {'unique_count', 'top_values', 'approximate'}
+        """
+        return {
+            col: {
+                'unique_count': self.cardinalities[col].count(),
+                'top_values': {str(k): int(v) for k, v in sketch.top(top_n).items()},
+                'approximate': True
+            }
+            for col, sketch in self.heavy_hitters.items()
+        }
+
+    def quantile_info(self, qs=None):
+        """
+        分位点情報を取得する
+
+        Args:
+            qs (list, optional): 分位のリスト
+
+        Returns:
+            dict: 列名 -> {'count', 'min', 'max', 'mean', 'quantiles'}
+        """
+        return {
+            col: {
+                'count': sketch.count,
+                'min': sketch.minimum,
+                'max': sketch.maximum,
+                'mean': sketch.total / sketch.count if sketch.count > 0 else None,
+                'quantiles': sketch.quantiles(qs)
+            }
+            for col, sketch in self.quantile_sketches.items()
+        }